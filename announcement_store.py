@@ -0,0 +1,278 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+DB_PATH = os.path.join("data", "announcements.db")
+# Announcement fields covered by the full-text index
+FTS_FIELDS = ('NEWSSUB', 'HEADLINE', 'MORE')
+# Names looked up per query when checking many attachments
+LOOKUP_CHUNK = 500
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value), "%Y%m%d").date()
+
+def date_range(from_day, to_day):
+    """Lists every calendar day from from_day to to_day inclusive."""
+    from_day, to_day = _to_date(from_day), _to_date(to_day)
+    return [from_day + timedelta(days=i) for i in range((to_day - from_day).days + 1)]
+
+def contiguous_runs(days):
+    """Groups sorted days into (first, last) runs of consecutive days."""
+    runs = []
+    for day in sorted(days):
+        if runs and day - runs[-1][1] == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+def fts_query(text):
+    """Turns a search box string into an FTS5 query.
+
+    "quoted words" match as a phrase, a trailing * makes a prefix match
+    (capex*), and all terms must match. Other FTS5 syntax is escaped.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        if phrase:
+            terms.append('"%s"' % phrase.replace('"', ''))
+            continue
+        prefix = word.endswith('*')
+        word = re.sub(r'[^\w]', ' ', word).strip()
+        if word:
+            terms.append('"%s"%s' % (word, '*' if prefix else ''))
+    return " ".join(terms)
+
+class AnnouncementStore:
+    """Local SQLite store of raw BSE announcement rows.
+
+    Rows are keyed by category, subcategory and dissemination day. A day is
+    recorded as filled only once it is in the past and was fetched without
+    page errors, so only missing days (and today) ever go back to BSE.
+    """
+
+    def __init__(self, path=DB_PATH):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS announcements ("
+                " category TEXT NOT NULL, subcategory TEXT NOT NULL, day TEXT NOT NULL, row TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_announcements_key ON announcements (category, subcategory, day)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS filled_days ("
+                " category TEXT NOT NULL, subcategory TEXT NOT NULL, day TEXT NOT NULL,"
+                " PRIMARY KEY (category, subcategory, day))"
+            )
+            self._create_text_index()
+            self._create_filing_tables()
+
+    def _create_text_index(self):
+        # Contentless FTS5 index keyed by the announcements rowid (rows are never
+        # VACUUMed, so rowids are stable). Triggers keep it in step with every
+        # insert and delete, so it grows incrementally as days are saved.
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'announcements_fts'"
+        ).fetchone()
+        columns = ", ".join(f.lower() for f in FTS_FIELDS)
+        values = ", ".join(f"json_extract({{0}}.row, '$.{f}')" for f in FTS_FIELDS)
+        self._conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS announcements_fts USING fts5({columns}, content='', prefix='2 3')"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS announcements_fts_insert AFTER INSERT ON announcements BEGIN"
+            f" INSERT INTO announcements_fts (rowid, {columns}) VALUES (new.rowid, {values.format('new')}); END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS announcements_fts_delete AFTER DELETE ON announcements BEGIN"
+            f" INSERT INTO announcements_fts (announcements_fts, rowid, {columns})"
+            f" VALUES ('delete', old.rowid, {values.format('old')}); END"
+        )
+        if not exists:
+            # Index rows stored before the index existed
+            self._conn.execute(
+                f"INSERT INTO announcements_fts (rowid, {columns})"
+                f" SELECT rowid, {values.format('announcements')} FROM announcements"
+            )
+
+    def _create_filing_tables(self):
+        # Text extracted from attachments (see filing_text), one row per
+        # ATTACHMENTNAME, with its own contentless index kept in step like
+        # announcements_fts. The expression index joins filings to rows.
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS filings ("
+            " attachment TEXT PRIMARY KEY, sha256 TEXT NOT NULL, text TEXT NOT NULL, error TEXT, extracted_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS filings_fts USING fts5(text, content='', prefix='2 3')")
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS filings_fts_insert AFTER INSERT ON filings BEGIN"
+            " INSERT INTO filings_fts (rowid, text) VALUES (new.rowid, new.text); END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS filings_fts_delete AFTER DELETE ON filings BEGIN"
+            " INSERT INTO filings_fts (filings_fts, rowid, text) VALUES ('delete', old.rowid, old.text); END"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_announcements_attachment ON announcements (json_extract(row, '$.ATTACHMENTNAME'))"
+        )
+
+    def missing_days(self, category, subcategory, from_day, to_day, today=None):
+        """Returns the days in range that must be fetched: unfilled days plus today."""
+        today = today or date.today()
+        days = date_range(from_day, to_day)
+        with self._lock:
+            filled = {
+                r[0] for r in self._conn.execute(
+                    "SELECT day FROM filled_days WHERE category = ? AND subcategory = ? AND day BETWEEN ? AND ?",
+                    (category, subcategory, days[0].isoformat(), days[-1].isoformat())
+                )
+            } if days else set()
+        return [d for d in days if d.isoformat() not in filled or d >= today]
+
+    def save(self, category, subcategory, from_day, to_day, df, complete=True, today=None):
+        """Replaces the stored rows for from_day..to_day with the rows in df.
+
+        Each row is filed under the day of its DissemDT, clamped into the
+        fetched range. Past days are marked filled when `complete` is true.
+        An incomplete fetch replaces nothing: only its rows not already stored
+        (by NEWSID, or the whole row without one) are added.
+        """
+        today = today or date.today()
+        days = date_range(from_day, to_day)
+        if not days:
+            return
+        first, last = days[0].isoformat(), days[-1].isoformat()
+
+        records = df.to_dict('records') if not df.empty else []
+        rows = []
+        for record in records:
+            day = str(record.get('DissemDT') or '')[:10]
+            if not (first <= day <= last):
+                day = first if day < first else last
+            rows.append((category, subcategory, day, json.dumps(record, default=str)))
+
+        with self._lock, self._conn:
+            if complete:
+                self._conn.execute(
+                    "DELETE FROM announcements WHERE category = ? AND subcategory = ? AND day BETWEEN ? AND ?",
+                    (category, subcategory, first, last)
+                )
+            else:
+                # A failed page must not drop rows an earlier fetch stored
+                stored = {
+                    newsid or row for newsid, row in self._conn.execute(
+                        "SELECT json_extract(row, '$.NEWSID'), row FROM announcements"
+                        " WHERE category = ? AND subcategory = ? AND day BETWEEN ? AND ?",
+                        (category, subcategory, first, last)
+                    )
+                }
+                rows = [r for r, record in zip(rows, records) if (record.get('NEWSID') or r[3]) not in stored]
+            self._conn.executemany("INSERT INTO announcements VALUES (?, ?, ?, ?)", rows)
+            if complete:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO filled_days VALUES (?, ?, ?)",
+                    [(category, subcategory, d.isoformat()) for d in days if d < today]
+                )
+
+    def load(self, category, subcategory, from_day, to_day):
+        """Returns the stored raw rows for the range, newest day first, in fetch order within a day."""
+        first, last = _to_date(from_day).isoformat(), _to_date(to_day).isoformat()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT row FROM announcements WHERE category = ? AND subcategory = ? AND day BETWEEN ? AND ?"
+                " ORDER BY day DESC, rowid",
+                (category, subcategory, first, last)
+            ).fetchall()
+        return pd.DataFrame([json.loads(r[0]) for r in rows])
+
+    def extracted_filings(self, names):
+        """Returns {attachment: sha256} for the names whose text has already been extracted."""
+        names = list(names)
+        found = {}
+        with self._lock:
+            for i in range(0, len(names), LOOKUP_CHUNK):
+                chunk = names[i:i + LOOKUP_CHUNK]
+                found.update(self._conn.execute(
+                    "SELECT attachment, sha256 FROM filings WHERE attachment IN (%s)" % ", ".join("?" * len(chunk)), chunk
+                ).fetchall())
+        return found
+
+    def save_filing(self, attachment, sha256, text, error=None):
+        """Stores (or replaces) the extracted text of one attachment."""
+        with self._lock, self._conn:
+            # Delete first so the index trigger sees the old text
+            self._conn.execute("DELETE FROM filings WHERE attachment = ?", (attachment,))
+            self._conn.execute("INSERT INTO filings VALUES (?, ?, ?, ?, ?)", (attachment, sha256, text, error, time.time()))
+
+    def load_filings(self, category, subcategory, from_day, to_day):
+        """Returns the stored rows for the range whose attachment text was extracted, with it in a FILING column."""
+        first, last = _to_date(from_day).isoformat(), _to_date(to_day).isoformat()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT a.row, f.text FROM filings f"
+                " JOIN announcements a ON json_extract(a.row, '$.ATTACHMENTNAME') = +f.attachment"
+                " WHERE f.error IS NULL AND a.category = ? AND a.subcategory = ? AND a.day BETWEEN ? AND ?"
+                " ORDER BY a.day DESC, a.rowid",
+                (category, subcategory, first, last)
+            ).fetchall()
+        return pd.DataFrame([dict(json.loads(row), FILING=text) for row, text in rows])
+
+    def filing_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM filings WHERE error IS NULL").fetchone()[0]
+
+    def search(self, text, from_day=None, to_day=None, categories=None, limit=500, filings=False):
+        """Full-text search over the stored NEWSSUB, HEADLINE and MORE fields.
+
+        See fts_query for the query syntax. With `filings` the text extracted
+        from the attachments is searched instead. Results can be limited to a
+        day range and to a list of categories, and come back newest day first
+        with 'category' and 'day' columns added to the raw rows.
+        """
+        query = fts_query(text)
+        if not query:
+            return pd.DataFrame()
+        # Matches are ranked on (day, rowid) alone; only the rows kept are read in full
+        if filings:
+            sql = ("SELECT a.rowid FROM filings_fts"
+                   " JOIN filings f ON f.rowid = filings_fts.rowid"
+                   # Unary + drops the column's TEXT affinity so idx_announcements_attachment is used
+                   " JOIN announcements a ON json_extract(a.row, '$.ATTACHMENTNAME') = +f.attachment"
+                   " WHERE filings_fts MATCH ?")
+        else:
+            sql = ("SELECT a.rowid FROM announcements_fts"
+                   " JOIN announcements a ON a.rowid = announcements_fts.rowid"
+                   " WHERE announcements_fts MATCH ?")
+        params = [query]
+        if from_day is not None:
+            sql += " AND a.day >= ?"
+            params.append(_to_date(from_day).isoformat())
+        if to_day is not None:
+            sql += " AND a.day <= ?"
+            params.append(_to_date(to_day).isoformat())
+        if categories:
+            sql += " AND a.category IN (%s)" % ", ".join("?" * len(categories))
+            params.extend(categories)
+        sql += " ORDER BY a.day DESC, a.rowid LIMIT ?"
+        params.append(limit)
+        sql = f"SELECT category, day, row FROM announcements WHERE rowid IN ({sql}) ORDER BY day DESC, rowid"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return pd.DataFrame([dict(json.loads(row), category=category, day=day) for category, day, row in rows])
@@ -1,51 +1,251 @@
-import requests
+import itertools
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
 import pandas as pd
-from datetime import datetime, timedelta
-
-def fetch_dataframe(updstr, fromdate, todate, tableno, pageno, subcat="-1"):
-    url = f"https://api.bseindia.com/BseIndiaAPI/api/AnnSubCategoryGetData/w?pageno={pageno}&strCat={updstr}&strPrevDate={fromdate}&strScrip=&strSearch=P&strToDate={todate}&strType=C&subcategory={subcat}"
-    headers = {
-        'authority': 'api.bseindia.com',
-        'accept': 'application/json, text/plain, */*',
-        'accept-language': 'en-US,en;q=0.9',
-        'origin': 'https://www.bseindia.com',
-        'referer': 'https://www.bseindia.com/',
-        'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36 Edg/117.0.2045.43'
-    }
-    
-    try:
-        response = requests.get(url, headers=headers)
+from collections import deque
+from concurrent.futures import as_completed
+from datetime import date, datetime, timedelta
+
+import http_client
+import metrics
+from attachment_cache import AttachmentCache, link_file
+
+BSE_ANNOUNCEMENTS_URL = "https://api.bseindia.com/BseIndiaAPI/api/AnnSubCategoryGetData/w"
+BSE_ATTACHMENT_URL = "https://www.bseindia.com/xml-data/corpfiling/AttachLive/"
+
+# BSE returns 50 announcements per page
+PAGE_SIZE = 50
+# Upper bound on concurrent page requests per category
+MAX_PAGE_WORKERS = 8
+# Wide ranges are split into shards of this many days, fetched by up to
+# MAX_SHARD_WORKERS at once; a failed shard is refetched up to SHARD_RETRIES times
+SHARD_DAYS = 7
+MAX_SHARD_WORKERS = 4
+SHARD_RETRIES = 2
+# Shards iter_bse_announcements fetches ahead of the one it is yielding
+STREAM_WORKERS = 4
+# Attachment downloads: concurrent workers, overall requests per second, streaming chunk size
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_RATE = 2.0
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# ZIP exports stay in memory up to this size, then spool to a temporary file
+ZIP_SPOOL_THRESHOLD = 32 * 1024 * 1024
+# Where collect_announcements.py writes its output and the dashboard looks for it
+COLLECTED_PATH = os.path.join("data", "announcements.csv")
+# Raw API fields used downstream (classification, the store, watch mode); the rest are dropped on fetch
+ANNOUNCEMENT_COLUMNS = ['NEWSID', 'SCRIP_CD', 'SLONGNAME', 'NEWSSUB', 'HEADLINE', 'MORE', 'SUBCATNAME', 'ATTACHMENTNAME', 'DissemDT']
+# Result columns held as categoricals: few distinct values, or text repeated once per matched keyword
+CATEGORICAL_COLUMNS = ['TYPE', 'SLONGNAME', 'SUBCATNAME', 'NEWSSUB', 'HEADLINE', 'LINK']
+
+def fetch_page_json(updstr, fromdate, todate, pageno, subcat="-1"):
+    """Fetches one raw page of the BSE announcements API. Raises on failure."""
+    url = f"{BSE_ANNOUNCEMENTS_URL}?pageno={pageno}&strCat={updstr}&strPrevDate={fromdate}&strScrip=&strSearch=P&strToDate={todate}&strType=C&subcategory={subcat}"
+    with metrics.stage('fetch_page', category=updstr, page=pageno) as info:
+        response = http_client.get(url, headers=http_client.BSE_API_HEADERS)
         response.raise_for_status()
-        if tableno == 'Table1':
-             # Table1 structure is simpler, usually just row count
-             data_json = response.json().get('Table1', [])
-        else:
-             data_json = response.json().get('Table', [])
-        
-        dataf = pd.DataFrame(data=data_json)
-        return dataf
-    except Exception as e:
-        print(f"Error fetching data: {e}")
+        data = response.json()
+        info['rows'] = len(data.get('Table') or [])
+    return data
+
+def announcement_frame(records):
+    """Builds a raw announcements frame keeping only ANNOUNCEMENT_COLUMNS."""
+    if not records:
         return pd.DataFrame()
+    return pd.DataFrame(records, columns=[c for c in ANNOUNCEMENT_COLUMNS if c in records[0]])
+
+def compact_announcements(df):
+    """Returns classified results with CATEGORICAL_COLUMNS as categoricals and DissemDT parsed.
+
+    Each repeated value is stored once and every row holds an integer
+    code, so an announcement matched by several keywords costs a few bytes
+    per extra match instead of another copy of its text.
+    """
+    if df.empty:
+        return df
+    df = df.astype({c: 'category' for c in CATEGORICAL_COLUMNS if c in df.columns})
+    if 'DissemDT' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['DissemDT']):
+        df['DissemDT'] = pd.to_datetime(df['DissemDT'], format='ISO8601', errors='coerce')
+    return df
+
+def fetch_category_pages(datastr, fromdate, todate, subcategory, max_workers=MAX_PAGE_WORKERS):
+    """Fetches every page of a category, pages 2..N concurrently.
+
+    Page 1 carries both the row count (Table1) and the first rows (Table), so
+    it is requested once. Rows are kept in page order and the DataFrame is
+    built in a single step. Returns (dataframe, errors) where errors holds one
+    message per page that could not be fetched; a page 1 without a row count
+    is an error too, so the range is not taken as empty.
+    """
+    try:
+        first_page = fetch_page_json(datastr, fromdate, todate, 1, subcategory)
+    except Exception as e:
+        return pd.DataFrame(), [f"{datastr} page 1: {e}"]
+
+    count_rows = first_page.get('Table1') or []
+    if not count_rows or 'ROWCNT' not in count_rows[0]:
+        # Without a row count the result cannot be told apart from a failed request
+        return pd.DataFrame(), [f"{datastr} page 1: response has no row count (Table1.ROWCNT)"]
+
+    rowcnt = int(count_rows[0]['ROWCNT'] or 0)
+    if rowcnt <= 0:
+        return pd.DataFrame(), []
+
+    num_pages = -(-rowcnt // PAGE_SIZE)
+    pages = {1: first_page.get('Table') or []}
+    errors = {}
 
-def fetch_category_data(datastr, fromdate, todate, subcategory):
-    # Fetch first page to get row count
-    page_df = fetch_dataframe(datastr, fromdate, todate, 'Table1', str(1), subcategory)
-    if page_df.empty or 'ROWCNT' not in page_df.columns:
+    if num_pages > 1:
+        workers = max(1, min(max_workers, num_pages - 1))
+        with metrics.RunExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(fetch_page_json, datastr, fromdate, todate, pagenumber, subcategory): pagenumber
+                for pagenumber in range(2, num_pages + 1)
+            }
+            for future in as_completed(futures):
+                pagenumber = futures[future]
+                try:
+                    pages[pagenumber] = future.result().get('Table') or []
+                except Exception as e:
+                    errors[pagenumber] = f"{datastr} page {pagenumber}: {e}"
+
+    records = [row for pagenumber in sorted(pages) for row in pages[pagenumber]]
+    return announcement_frame(records), [errors[p] for p in sorted(errors)]
+
+def date_shards(from_day, to_day, shard_days=SHARD_DAYS):
+    """Splits from_day..to_day (dates or YYYYMMDD strings) into (first, last) shards, newest first."""
+    if isinstance(from_day, str):
+        from_day = datetime.strptime(from_day, "%Y%m%d").date()
+    if isinstance(to_day, str):
+        to_day = datetime.strptime(to_day, "%Y%m%d").date()
+    shards = []
+    last = to_day
+    while last >= from_day:
+        first = max(from_day, last - timedelta(days=shard_days - 1))
+        shards.append((first, last))
+        last = first - timedelta(days=1)
+    return shards
+
+def fetch_shards(datastr, shards, subcategory, max_workers=MAX_SHARD_WORKERS, retries=SHARD_RETRIES, page_workers=MAX_PAGE_WORKERS):
+    """Fetches every page of each (first, last) shard concurrently.
+
+    Shards with page errors are fetched again as a whole, up to `retries`
+    times, while the shards that succeeded are kept. Returns a dict mapping
+    each shard to (dataframe, errors); errors are from the last attempt.
+    """
+    results = {}
+    pending = list(shards)
+    for _ in range(retries + 1):
+        if not pending:
+            break
+        workers = max(1, min(max_workers, len(pending)))
+        with metrics.RunExecutor(max_workers=workers) as executor:
+            futures = {
+                shard: executor.submit(fetch_category_pages, datastr, shard[0].strftime("%Y%m%d"),
+                                       shard[1].strftime("%Y%m%d"), subcategory, page_workers)
+                for shard in pending
+            }
+            for shard, future in futures.items():
+                results[shard] = future.result()
+        pending = [shard for shard in pending if results[shard][1]]
+    return results
+
+def merge_shards(frames):
+    """Concatenates shard frames in order, dropping announcements repeated at shard edges."""
+    frames = [df for df in frames if not df.empty]
+    if not frames:
         return pd.DataFrame()
+    merged = pd.concat(frames, ignore_index=True)
+    if 'NEWSID' in merged.columns:
+        merged = merged.drop_duplicates(subset='NEWSID', ignore_index=True)
+    return merged
 
-    rowcnt = page_df.loc[0]['ROWCNT']
-    fetchdf = pd.DataFrame()
-    
-    if rowcnt > 0:
-        # Calculate pagination (50 items per page)
-        num_pages = (rowcnt // 50) + 2
-        for pagenumber in range(1, int(num_pages)):
-            pagewise_df = fetch_dataframe(datastr, fromdate, todate, 'Table', str(pagenumber), subcategory)
-            fetchdf = pd.concat([fetchdf, pagewise_df], ignore_index=True)
+def fetch_category_data(datastr, fromdate, todate, subcategory, max_workers=MAX_PAGE_WORKERS, errors=None, shard_days=SHARD_DAYS):
+    """Fetches all pages of a category. Page failures are appended to `errors` if given, else printed.
 
+    Ranges longer than `shard_days` are fetched as concurrent shards and
+    merged newest first. Every shard, including a range's only one, goes
+    through fetch_shards and its retries.
+    """
+    with metrics.stage('fetch_category_data', category=datastr, fromdate=fromdate, todate=todate) as info:
+        shards = date_shards(fromdate, todate, shard_days)
+        results = fetch_shards(datastr, shards, subcategory, page_workers=max_workers)
+        fetchdf = merge_shards(results[shard][0] for shard in shards)
+        page_errors = [e for shard in shards for e in results[shard][1]]
+        info['rows'] = len(fetchdf)
+        info['shards'] = len(shards)
+        info['page_errors'] = len(page_errors)
+    if errors is not None:
+        errors.extend(page_errors)
+    else:
+        for e in page_errors:
+            print(f"Error fetching data: {e}")
     return fetchdf
 
+def fetch_category_cached(store, datastr, from_date, to_date, subcategory, max_workers=MAX_PAGE_WORKERS, errors=None, shard_days=SHARD_DAYS):
+    """Fetches a category through an AnnouncementStore.
+
+    Only days missing from the store (plus today) are requested from BSE.
+    Each run of consecutive missing days is split into shards that are
+    fetched concurrently and saved one by one, so a shard that still fails
+    after its retries is the only part fetched again next time. The full
+    range is then read back from the store.
+    """
+    from announcement_store import contiguous_runs
+
+    shards = [
+        shard for run_start, run_end in contiguous_runs(store.missing_days(datastr, subcategory, from_date, to_date))
+        for shard in date_shards(run_start, run_end, shard_days)
+    ]
+    if shards:
+        with metrics.stage('fetch_category_cached', category=datastr, shards=len(shards)) as info:
+            results = fetch_shards(datastr, shards, subcategory, page_workers=max_workers)
+            info['rows'] = sum(len(df) for df, _ in results.values())
+    for shard in shards:
+        shard_df, shard_errors = results[shard]
+        # A shard with failed pages only adds rows and is left unfilled so it is fetched again
+        store.save(datastr, subcategory, shard[0], shard[1], shard_df, complete=not shard_errors)
+        if errors is not None:
+            errors.extend(shard_errors)
+        else:
+            for e in shard_errors:
+                print(f"Error fetching data: {e}")
+
+    return store.load(datastr, subcategory, from_date, to_date)
+
+def _row_ids(records):
+    # NEWSID identifies an announcement; rows without one fall back to time and subject
+    return [r.get('NEWSID') or (r.get('DissemDT'), r.get('NEWSSUB')) for r in records]
+
+def fetch_new_rows(datastr, fromdate, todate, subcategory, watermark, seen_ids):
+    """Pages a category newest first and returns only rows not in `seen_ids`.
+
+    Paging stops at the first page holding a row disseminated before
+    `watermark` (the newest DissemDT of an earlier fetch), since every later
+    page is older still, so a poll with nothing new costs one request.
+    Returns (records, error); on error no records are returned, so the
+    caller's high-water mark does not skip past the failed page.
+    """
+    new_records = []
+    pageno = 1
+    while True:
+        try:
+            data = fetch_page_json(datastr, fromdate, todate, pageno, subcategory)
+        except Exception as e:
+            return [], f"{datastr} page {pageno}: {e}"
+        rows = data.get('Table') or []
+        new_records.extend(row for row, row_id in zip(rows, _row_ids(rows)) if row_id not in seen_ids)
+        count_rows = data.get('Table1') or [{}]
+        rowcnt = int(count_rows[0].get('ROWCNT') or 0)
+        reached_known = any(str(row.get('DissemDT') or '') < watermark for row in rows)
+        if not rows or reached_known or pageno * PAGE_SIZE >= rowcnt:
+            return new_records, None
+        pageno += 1
+
+@metrics.timed('search_data', lambda searchstr, df: {'keyword': searchstr})
 def search_data(searchstr, df):
     if df.empty:
         return pd.DataFrame()
@@ -64,30 +264,119 @@ def search_data(searchstr, df):
     searched_data = df.loc[mask]
     
     # Select specific columns
-    target_cols = ['SLONGNAME', 'NEWSSUB', 'HEADLINE', 'ATTACHMENTNAME', 'DissemDT', 'SUBCATNAME']
+    target_cols = ['SCRIP_CD', 'SLONGNAME', 'NEWSSUB', 'HEADLINE', 'ATTACHMENTNAME', 'DissemDT', 'SUBCATNAME']
     available_cols = [c for c in target_cols if c in searched_data.columns]
     
     searched_data_df = searched_data[available_cols].copy()
     searched_data_df = searched_data_df.drop_duplicates()
     
     if 'ATTACHMENTNAME' in searched_data_df.columns:
-        searched_data_df['LINK'] = 'https://www.bseindia.com/xml-data/corpfiling/AttachLive/' + searched_data_df['ATTACHMENTNAME']
+        searched_data_df['LINK'] = BSE_ATTACHMENT_URL + searched_data_df['ATTACHMENTNAME']
         del searched_data_df['ATTACHMENTNAME']
     
     searched_data_df.insert(0, 'TYPE', searchstr)
     return searched_data_df
 
-def get_bse_announcements(from_date, to_date):
-    # Convert dates to string format required by API (YYYYMMDD)
-    fromdate_str = from_date.strftime("%Y%m%d")
-    todate_str = to_date.strftime("%Y%m%d")
-    
-    all_results = []
-    
-    # 1. Company Updates
-    comp_df = fetch_category_data("Company+Update", fromdate_str, todate_str, "-1")
-    
-    categories = [
+def _trie_regex(words):
+    """Builds a regex alternation factored by common prefixes (longest match first)."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+def _keyword_patterns(keywords):
+    """Compiles lowercased keywords into one lookahead pattern.
+
+    At any position the match is the longest keyword starting there; every
+    shorter keyword that is a prefix of it matches at the same position and
+    is looked up via `implied`. ASCII text is lowercased and scanned with
+    this case-sensitive pattern, which is several times faster than
+    re.IGNORECASE.
+    """
+    ordered = sorted({k.lower() for k in keywords}, key=len, reverse=True)
+    body = '(?=(' + _trie_regex(ordered) + '))'
+    implied = {k: [j for j in ordered if k.startswith(j)] for k in ordered}
+    return re.compile(body), ordered, implied
+
+@metrics.timed('classify_data', lambda keywords, df: {'keywords': len(keywords), 'rows_in': len(df)})
+def classify_data(keywords, df):
+    """Tags every row with all matching keywords in a single pass.
+
+    Equivalent to concatenating search_data(kw, df) for each keyword in order,
+    but the four search columns are scanned once with a combined pattern
+    instead of once per keyword.
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    required_cols = ['NEWSSUB', 'HEADLINE', 'MORE', 'SUBCATNAME']
+    for col in required_cols:
+        if col not in df.columns:
+            df[col] = ''
+
+    pattern, ordered, implied = _keyword_patterns(keywords)
+    # NUL never occurs in a keyword, so matches cannot span two columns
+    texts = [df[col].astype(str).fillna('') for col in required_cols]
+    combined = texts[0].str.cat(texts[1:], sep='\x00')
+
+    hits = {k: [] for k in ordered}
+    non_ascii = []
+    for pos, text in enumerate(combined):
+        if not text.isascii():
+            non_ascii.append(pos)
+            continue
+        found = set()
+        for match in pattern.findall(text.lower()):
+            found.update(implied[match])
+        for key in found:
+            hits[key].append(pos)
+    if non_ascii:
+        # Case folding outside ASCII depends on the string engine, so the few
+        # such rows are matched with the same str.contains call as search_data
+        rows = combined.iloc[non_ascii]
+        for key in ordered:
+            matched = rows.str.contains(key, case=False, na=False).to_numpy()
+            if matched.any():
+                hits[key] = sorted(hits[key] + [non_ascii[i] for i in matched.nonzero()[0]])
+
+    # (keyword, row) pairs in keyword order then row order, as the per-keyword loop produced
+    types = []
+    positions = []
+    for searchstr in keywords:
+        matched = hits[searchstr.lower()]
+        types.extend([searchstr] * len(matched))
+        positions.extend(matched)
+    if not positions:
+        return pd.DataFrame()
+
+    target_cols = ['SCRIP_CD', 'SLONGNAME', 'NEWSSUB', 'HEADLINE', 'ATTACHMENTNAME', 'DissemDT', 'SUBCATNAME']
+    available_cols = [c for c in target_cols if c in df.columns]
+
+    classified_df = df[available_cols].take(positions).reset_index(drop=True)
+    classified_df.insert(0, 'TYPE', types)
+    # Dropping duplicates with TYPE included dedupes within each keyword only
+    classified_df = classified_df.drop_duplicates(ignore_index=True)
+
+    if 'ATTACHMENTNAME' in classified_df.columns:
+        classified_df['LINK'] = BSE_ATTACHMENT_URL + classified_df['ATTACHMENTNAME']
+        del classified_df['ATTACHMENTNAME']
+    return classified_df
+
+# Category groups fetched for the announcements tab, in output order:
+# name -> (BSE category, BSE subcategory, keywords searched within it)
+CATEGORY_GROUPS = {
+    "company_update": ("Company+Update", "-1", [
         "Investor Meet", "Credit Rating", "Presentation", "Transcript", "Press Release",
         "Contract", "FDA", "Inspection", "Demerger", "Buyback", "Buy back", "Offer",
         "Strike", "Expansion", "Capex", "Capacity", "Shut down", "Prefer", "Delisting",
@@ -96,124 +385,396 @@ def get_bse_announcements(from_date, to_date):
         "One time settlement", "Scheme of arrangement", "Resolution plan", "Hiving off",
         "Slump", "Forensic auditor", "Raising", "Restructuring", "Qualified", "Allotment",
         "Joint Venture", "Monthly Business Updates"
-    ]
+    ]),
+    "corp_action": ("Corp.+Action", "-1", ["Bonus", "Split", "Right Issue", "Merger"]),
+    "insider_trading": ("Insider+Trading+%2F+SAST", "-1", ["SAST"]),
+    "agm_egm": ("AGM%2FEGM", "EGM", ["EGM"]),
+    "board_meeting": ("Board+Meeting", "Outcome+of+Board+Meeting", ["Outcome"]),
+}
+
+def get_bse_announcements(from_date, to_date, errors=None, store=None, groups=None):
+    # Page-level fetch failures are appended to `errors` when a list is passed.
+    # With an AnnouncementStore only days missing from it are fetched from BSE.
+    # `groups` limits the run to those CATEGORY_GROUPS names (all by default).
+    # Convert dates to string format required by API (YYYYMMDD)
+    fromdate_str = from_date.strftime("%Y%m%d")
+    todate_str = to_date.strftime("%Y%m%d")
     
-    for cat in categories:
-        res = search_data(cat, comp_df)
-        if not res.empty:
-            all_results.append(res)
-            
-    # 2. Corp Actions
-    corp_df = fetch_category_data("Corp.+Action", fromdate_str, todate_str, "-1")
-    corp_categories = ["Bonus", "Split", "Right Issue", "Merger"]
-    for cat in corp_categories:
-        res = search_data(cat, corp_df)
+    all_results = []
+    
+    for name, (datastr, subcategory, keywords) in CATEGORY_GROUPS.items():
+        if groups is not None and name not in groups:
+            continue
+        if store is not None:
+            category_df = fetch_category_cached(store, datastr, from_date, to_date, subcategory, errors=errors)
+        else:
+            category_df = fetch_category_data(datastr, fromdate_str, todate_str, subcategory, errors=errors)
+        res = classify_data(keywords, category_df)
         if not res.empty:
             all_results.append(res)
-            
-    # 3. Insider Trading
-    insider_df = fetch_category_data("Insider+Trading+%2F+SAST", fromdate_str, todate_str, "-1")
-    res = search_data("SAST", insider_df)
-    if not res.empty:
-        all_results.append(res)
-        
-    # 4. AGM/EGM
-    agm_df = fetch_category_data("AGM%2FEGM", fromdate_str, todate_str, "EGM")
-    res = search_data("EGM", agm_df)
-    if not res.empty:
-        all_results.append(res)
-        
-    # 5. Board Meetings
-    board_meet_df = fetch_category_data("Board+Meeting", fromdate_str, todate_str, "Outcome+of+Board+Meeting")
-    res = search_data("Outcome", board_meet_df)
-    if not res.empty:
-        all_results.append(res)
         
     if all_results:
-        return pd.concat(all_results, axis=0, ignore_index=True)
+        return compact_announcements(pd.concat(all_results, axis=0, ignore_index=True))
     
     return pd.DataFrame()
 
-def download_pdfs(df, download_dir):
-    import os
-    import time
-    
+def classify_filings(store, from_date, to_date, groups=None):
+    """Classifies the stored announcements of a range by their filing text as well as their own fields.
+
+    Only rows whose attachment text was extracted into the store (see
+    filing_text) are read, and nothing is fetched from BSE. Results have the
+    same columns as get_bse_announcements.
+    """
+    all_results = []
+    for name, (datastr, subcategory, keywords) in CATEGORY_GROUPS.items():
+        if groups is not None and name not in groups:
+            continue
+        df = store.load_filings(datastr, subcategory, from_date, to_date)
+        if df.empty:
+            continue
+        # The filing is searched as part of MORE; the NUL keeps a keyword from spanning the two
+        more = df['MORE'].fillna('').astype(str) if 'MORE' in df.columns else ''
+        df['MORE'] = more + '\x00' + df.pop('FILING')
+        res = classify_data(keywords, df)
+        if not res.empty:
+            all_results.append(res)
+
+    if all_results:
+        return compact_announcements(pd.concat(all_results, axis=0, ignore_index=True))
+    return pd.DataFrame()
+
+def iter_bse_announcements(from_date, to_date, errors=None, store=None, groups=None,
+                           shard_days=SHARD_DAYS, max_workers=STREAM_WORKERS):
+    """Yields (done, total, chunk) as each shard of each category group is fetched and classified.
+
+    Unlike get_bse_announcements nothing waits for the whole range: every
+    category is split into date_shards (newest first) and each shard's
+    classified, compacted rows are yielded as soon as it is ready, so
+    `chunk` may be empty. At most `max_workers` shards are fetched ahead of
+    the one being yielded, which bounds the raw rows held at once.
+    Announcements repeated at shard edges are yielded once. Rows arrive
+    shard by shard rather than keyword by keyword within a category.
+    Errors go to `errors` like get_bse_announcements.
+    """
+    tasks = [
+        (name, datastr, subcategory, keywords, shard)
+        for name, (datastr, subcategory, keywords) in CATEGORY_GROUPS.items()
+        if groups is None or name in groups
+        for shard in date_shards(from_date, to_date, shard_days)
+    ]
+
+    def fetch(task):
+        _, datastr, subcategory, _, (first, last) = task
+        if store is not None:
+            shard_errors = []
+            df = fetch_category_cached(store, datastr, first, last, subcategory, errors=shard_errors, shard_days=shard_days)
+            return df, shard_errors
+        # Retried like the shards of fetch_category_data
+        return fetch_shards(datastr, [(first, last)], subcategory)[(first, last)]
+
+    seen = {}
+    remaining = iter(tasks)
+    workers = max(1, min(max_workers, len(tasks)))
+    with metrics.RunExecutor(max_workers=workers) as executor:
+        pending = deque((task, executor.submit(fetch, task)) for task in itertools.islice(remaining, workers))
+        for done in range(1, len(tasks) + 1):
+            (name, _, _, keywords, _), future = pending.popleft()
+            task = next(remaining, None)
+            if task is not None:
+                pending.append((task, executor.submit(fetch, task)))
+
+            df, shard_errors = future.result()
+            if errors is not None:
+                errors.extend(shard_errors)
+            else:
+                for e in shard_errors:
+                    print(f"Error fetching data: {e}")
+            if 'NEWSID' in df.columns:
+                ids = seen.setdefault(name, set())
+                df = df[~df['NEWSID'].isin(ids)].drop_duplicates(subset='NEWSID')
+                ids.update(df['NEWSID'])
+            yield done, len(tasks), compact_announcements(classify_data(keywords, df))
+
+class AnnouncementWatcher:
+    """Polls one day's announcements and returns only the rows not seen by earlier polls.
+
+    The first poll fetches every page of each category. After that, each
+    category keeps a high-water mark (newest DissemDT) and the NEWSIDs seen,
+    and fetch_new_rows stops paging at known rows, so a quiet poll costs one
+    page per category. Only new rows are classified. State resets when the
+    day changes.
+    """
+
+    def __init__(self, groups=None):
+        self.groups = groups
+        self.day = None
+        self.polls = 0
+        self.last_polled = None
+        self._state = {}
+
+    def poll(self, errors=None, day=None):
+        """Returns the newly classified rows (possibly empty). Failures go to `errors` if given, else printed."""
+        day = day or date.today()
+        if day != self.day:
+            self.day = day
+            self._state = {}
+        daystr = day.strftime("%Y%m%d")
+
+        all_results = []
+        for name, (datastr, subcategory, keywords) in CATEGORY_GROUPS.items():
+            if self.groups is not None and name not in self.groups:
+                continue
+            state = self._state.get(name)
+            with metrics.stage('poll_category', category=datastr) as info:
+                if state is None:
+                    df, page_errors = fetch_category_pages(datastr, daystr, daystr, subcategory)
+                    records = df.to_dict('records')
+                    error = "; ".join(page_errors) or None
+                else:
+                    records, error = fetch_new_rows(datastr, daystr, daystr, subcategory,
+                                                    state['watermark'], state['seen'])
+                info['rows'] = len(records)
+            if error:
+                if errors is not None:
+                    errors.append(error)
+                else:
+                    print(f"Error fetching data: {error}")
+                continue
+
+            if state is None:
+                state = self._state[name] = {'watermark': '', 'seen': set()}
+            state['seen'].update(_row_ids(records))
+            state['watermark'] = max([state['watermark']] + [str(r.get('DissemDT') or '') for r in records])
+            if records:
+                res = classify_data(keywords, announcement_frame(records))
+                if not res.empty:
+                    all_results.append(res)
+
+        self.polls += 1
+        self.last_polled = datetime.now()
+        if all_results:
+            return compact_announcements(pd.concat(all_results, axis=0, ignore_index=True))
+        return pd.DataFrame()
+
+def save_announcements(df, path=COLLECTED_PATH):
+    """Writes classified announcements to .parquet (needs pyarrow) or .csv, chosen by extension.
+
+    The file is written next to its destination and then renamed into place,
+    so a reader never sees a half-written file.
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp_path = path + '.tmp'
+    if path.endswith('.parquet'):
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def load_announcements(path=COLLECTED_PATH):
+    """Reads a file written by save_announcements, compacted like get_bse_announcements output."""
+    if path.endswith('.parquet'):
+        return compact_announcements(pd.read_parquet(path))
+    try:
+        return compact_announcements(pd.read_csv(path, dtype=str, keep_default_na=False))
+    except pd.errors.EmptyDataError:
+        # An empty result is written as an empty file
+        return pd.DataFrame()
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` acquisitions per second, bursting up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def _attachment_filename(item):
+    # Create a safe filename
+    safe_company = "".join([c for c in item['SLONGNAME'] if c.isalnum() or c in (' ', '-', '_')]).strip()
+    safe_type = "".join([c for c in item['TYPE'] if c.isalnum() or c in (' ', '-', '_')]).strip()
+    return f"{safe_company}_{safe_type}_{item['LINK'].split('/')[-1]}"
+
+def _content_range_start(response):
+    # "bytes 1000-4999/5000" -> 1000; None when the header is missing or malformed
+    match = re.match(r'bytes (\d+)-', response.headers.get('Content-Range', ''))
+    return int(match.group(1)) if match else None
+
+def _discard_part(part_path):
+    for path in (part_path, part_path + '.validator'):
+        if os.path.exists(path):
+            os.remove(path)
+
+def _download_to_file(link, filepath, bucket, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """Streams one attachment to filepath through a .part file and returns its result record.
+
+    A .part left by an interrupted run is resumed with a Range request sent
+    with If-Range (the ETag or Last-Modified of the response it came from,
+    kept in a .part.validator file), so a changed file comes back whole
+    instead of being spliced onto old bytes. A .part without a validator, a
+    416 answer or a 206 that does not start at the .part's end is discarded
+    and the download restarted.
+    """
+    part_path = filepath + '.part'
+    validator_path = part_path + '.validator'
+    result = {'link': link, 'file': filepath, 'status': 'failed', 'http_status': None, 'bytes': 0, 'latency': 0.0, 'error': None}
+    started = time.perf_counter()
+    try:
+        for attempt in range(2):
+            validator = None
+            if os.path.exists(validator_path):
+                with open(validator_path) as f:
+                    validator = f.read().strip() or None
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = dict(http_client.BSE_ATTACHMENT_HEADERS)
+            if offset and validator:
+                headers['Range'] = f"bytes={offset}-"
+                headers['If-Range'] = validator
+
+            bucket.acquire()
+            with http_client.stream('GET', link, headers=headers) as response:
+                result['http_status'] = response.status_code
+                resumed = 'Range' in headers and response.status_code == 206
+                if response.status_code == 416 or (resumed and _content_range_start(response) != offset):
+                    # The .part is complete, longer than the file, or does not line up with the reply
+                    _discard_part(part_path)
+                    continue
+                if response.status_code not in (200, 206):
+                    result['error'] = f"Failed to download {link}: Status {response.status_code}"
+                    return result
+                if not resumed:
+                    validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+                    with open(validator_path, 'w') as f:
+                        f.write(validator or '')
+                with open(part_path, 'ab' if resumed else 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        result['bytes'] += len(chunk)
+            os.replace(part_path, filepath)
+            _discard_part(part_path)
+            result['status'] = 'downloaded'
+            return result
+        result['error'] = f"Failed to download {link}: could not resume or restart the partial file"
+    except Exception as e:
+        result['error'] = f"Error downloading {link}: {e}"
+    finally:
+        result['latency'] = time.perf_counter() - started
+    return result
+
+def _fetch_to_cache(cache, link, bucket):
+    """Returns the result record for one attachment, downloading it into the cache unless it is there.
+
+    On success result['file'] is the cached blob and status is 'downloaded' or 'cached'.
+    """
+    name = link.split('/')[-1]
+    # A session fetching the same attachment waits here and then finds it cached
+    with cache.lock(name):
+        blob = cache.get(name)
+        if blob:
+            return {'link': link, 'file': blob, 'status': 'cached', 'http_status': None, 'bytes': 0, 'latency': 0.0, 'error': None}
+        result = _download_to_file(link, cache.staging_path(name), bucket)
+        if result['status'] == 'downloaded':
+            try:
+                result['file'] = cache.add(name, result['file'])
+            except Exception as e:
+                result.update(status='failed', error=f"Error caching {link}: {e}")
+    return result
+
+def _fetch_links(executor, cache, links, bucket):
+    # One fetch per distinct attachment, however many named copies it gets
+    return {link: executor.submit(_fetch_to_cache, cache, link, bucket) for link in dict.fromkeys(links)}
+
+@metrics.timed('download_pdfs', lambda df, *args, **kwargs: {'links': len(df)})
+def download_pdfs(df, download_dir, max_workers=DOWNLOAD_WORKERS, rate=DOWNLOAD_RATE, results=None, cache=None):
+    """Downloads the attachments in df into download_dir.
+
+    Attachments come from the AttachmentCache (the default one unless
+    `cache` is given); missing ones are fetched by up to `max_workers`
+    threads over the shared HTTP client, limited to `rate` requests per
+    second overall. Each named file is a hardlink to the cached blob, so an
+    attachment matched under several TYPEs is fetched once. Returns
+    (written_count, errors); per-file result records (link, file, status,
+    http_status, bytes, latency, error) are appended to `results` when a
+    list is passed.
+    """
     if not os.path.exists(download_dir):
         os.makedirs(download_dir)
-        
-    headers = {
-      'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-      'Accept-Language': 'en-US,en;q=0.9,en-IN;q=0.8',
-      'Connection': 'keep-alive',
-      'Sec-Fetch-Dest': 'document',
-      'Sec-Fetch-Mode': 'navigate',
-      'Sec-Fetch-Site': 'none',
-      'Sec-Fetch-User': '?1',
-      'Upgrade-Insecure-Requests': '1',
-      'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36 Edg/134.0.0.0',
-      'sec-ch-ua': '"Chromium";v="134", "Not:A-Brand";v="24", "Microsoft Edge";v="134"',
-      'sec-ch-ua-mobile': '?0',
-      'sec-ch-ua-platform': '"Windows"'
-    }
-    
+
     downloaded_count = 0
     errors = []
     
     # Iterate through unique links to avoid duplicates
     unique_links = df[['LINK', 'SLONGNAME', 'TYPE']].drop_duplicates().to_dict('records')
-    
+
+    pending = []
     for item in unique_links:
-        link = item['LINK']
-        company = item['SLONGNAME']
-        atype = item['TYPE']
-        
-        # Create a safe filename
-        safe_company = "".join([c for c in company if c.isalnum() or c in (' ', '-', '_')]).strip()
-        safe_type = "".join([c for c in atype if c.isalnum() or c in (' ', '-', '_')]).strip()
-        filename = f"{safe_company}_{safe_type}_{link.split('/')[-1]}"
-        
-        filepath = os.path.join(download_dir, filename)
-        
+        filepath = os.path.join(download_dir, _attachment_filename(item))
         if os.path.exists(filepath):
+            if results is not None:
+                results.append({'link': item['LINK'], 'file': filepath, 'status': 'skipped', 'http_status': None,
+                                'bytes': 0, 'latency': 0.0, 'error': None})
             continue
-            
-        try:
-            response = requests.get(link, headers=headers, timeout=30)
-            if response.status_code == 200:
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
-                downloaded_count += 1
-            else:
-                errors.append(f"Failed to download {link}: Status {response.status_code}")
-        except Exception as e:
-            errors.append(f"Error downloading {link}: {e}")
-            
-        # Be polite to the server
-        time.sleep(0.5)
+        pending.append((item['LINK'], filepath))
+
+    if not pending:
+        return downloaded_count, errors
+
+    cache = cache or AttachmentCache()
+    bucket = TokenBucket(rate)
+    workers = max(1, min(max_workers, len(pending)))
+    with metrics.RunExecutor(max_workers=workers) as executor:
+        fetches = _fetch_links(executor, cache, [link for link, _ in pending], bucket)
+        used = set()
+        for link, filepath in pending:
+            fetched = fetches[link].result()
+            # The first copy carries the transfer; later copies of the same link come from the cache
+            result = dict(fetched, file=filepath) if link not in used else dict(
+                fetched, file=filepath, status='cached', bytes=0, latency=0.0, http_status=None)
+            if fetched['status'] in ('downloaded', 'cached'):
+                try:
+                    link_file(fetched['file'], filepath)
+                    downloaded_count += 1
+                except OSError as e:
+                    result.update(status='failed', error=f"Error writing {filepath}: {e}")
+                    errors.append(result['error'])
+            elif link not in used:
+                errors.append(fetched['error'])
+            used.add(link)
+            if results is not None:
+                results.append(result)
         
     return downloaded_count, errors
 
-def download_pdfs_to_zip(df):
-    import io
-    import zipfile
-    import time
-    
-    zip_buffer = io.BytesIO()
-    
-    headers = {
-      'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-      'Accept-Language': 'en-US,en;q=0.9,en-IN;q=0.8',
-      'Connection': 'keep-alive',
-      'Sec-Fetch-Dest': 'document',
-      'Sec-Fetch-Mode': 'navigate',
-      'Sec-Fetch-Site': 'none',
-      'Sec-Fetch-User': '?1',
-      'Upgrade-Insecure-Requests': '1',
-      'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36 Edg/134.0.0.0',
-      'sec-ch-ua': '"Chromium";v="134", "Not:A-Brand";v="24", "Microsoft Edge";v="134"',
-      'sec-ch-ua-mobile': '?0',
-      'sec-ch-ua-platform': '"Windows"'
-    }
+@metrics.timed('download_pdfs_to_zip', lambda df, *args, **kwargs: {'links': len(df)})
+def download_pdfs_to_zip(df, max_workers=DOWNLOAD_WORKERS, rate=DOWNLOAD_RATE, spool_threshold=ZIP_SPOOL_THRESHOLD, cache=None):
+    """Downloads the attachments in df into a ZIP archive.
+
+    Attachments come from the AttachmentCache (fetching missing ones
+    concurrently) and are copied into the archive one entry at a time, so
+    memory stays flat regardless of the result size. The archive is held in
+    memory up to `spool_threshold` bytes and spooled to a temporary file
+    beyond that. PDFs are already compressed and are stored without
+    recompression. Returns (archive_file, entry_count, errors) with
+    archive_file positioned at the start.
+    """
+    archive = tempfile.SpooledTemporaryFile(max_size=spool_threshold)
     
     downloaded_count = 0
     errors = []
@@ -221,29 +782,26 @@ def download_pdfs_to_zip(df):
     # Iterate through unique links to avoid duplicates
     unique_links = df[['LINK', 'SLONGNAME', 'TYPE']].drop_duplicates().to_dict('records')
     
-    with zipfile.ZipFile(zip_buffer, 'a', zipfile.ZIP_DEFLATED) as zip_file:
-        for item in unique_links:
-            link = item['LINK']
-            company = item['SLONGNAME']
-            atype = item['TYPE']
-            
-            # Create a safe filename
-            safe_company = "".join([c for c in company if c.isalnum() or c in (' ', '-', '_')]).strip()
-            safe_type = "".join([c for c in atype if c.isalnum() or c in (' ', '-', '_')]).strip()
-            filename = f"{safe_company}_{safe_type}_{link.split('/')[-1]}"
-            
-            try:
-                response = requests.get(link, headers=headers, timeout=30)
-                if response.status_code == 200:
-                    zip_file.writestr(filename, response.content)
-                    downloaded_count += 1
-                else:
-                    errors.append(f"Failed to download {link}: Status {response.status_code}")
-            except Exception as e:
-                errors.append(f"Error downloading {link}: {e}")
-                
-            # Be polite to the server
-            time.sleep(0.5)
+    cache = cache or AttachmentCache()
+    bucket = TokenBucket(rate)
+    workers = max(1, min(max_workers, len(unique_links)))
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        with metrics.RunExecutor(max_workers=workers) as executor:
+            fetches = _fetch_links(executor, cache, [item['LINK'] for item in unique_links], bucket)
+            failed = set()
+
+            # Entries are written in input order while later downloads continue
+            for item in unique_links:
+                result = fetches[item['LINK']].result()
+                if result['status'] not in ('downloaded', 'cached'):
+                    if item['LINK'] not in failed:
+                        errors.append(result['error'])
+                        failed.add(item['LINK'])
+                    continue
+                filename = _attachment_filename(item)
+                compress_type = zipfile.ZIP_STORED if filename.lower().endswith('.pdf') else zipfile.ZIP_DEFLATED
+                zip_file.write(result['file'], filename, compress_type=compress_type)
+                downloaded_count += 1
             
-    zip_buffer.seek(0)
-    return zip_buffer, downloaded_count, errors
+    archive.seek(0)
+    return archive, downloaded_count, errors
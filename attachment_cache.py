@@ -0,0 +1,94 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.path.join("data", "attachments")
+HASH_CHUNK_SIZE = 1024 * 1024
+# Fetches of one name are serialised across every AttachmentCache in the
+# process; names are spread over this many locks
+LOCK_STRIPES = 64
+
+_name_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def link_file(source, target):
+    """Hardlinks source to target, copying instead where links are not supported."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+class AttachmentCache:
+    """Content-addressed local cache of BSE attachments.
+
+    Each attachment is stored once under objects/<sha256[:2]>/<sha256> and
+    indexed by its ATTACHMENTNAME together with its hash and size. Reads
+    re-hash the blob, so a damaged or edited file is dropped and fetched
+    again rather than served.
+    """
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        self.tmp_dir = os.path.join(directory, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS attachments ("
+                " name TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER NOT NULL, stored_at REAL NOT NULL)"
+            )
+
+    def _blob_path(self, sha256):
+        return os.path.join(self.directory, "objects", sha256[:2], sha256)
+
+    def lock(self, name):
+        """Process-wide lock to hold while fetching and adding `name`, so concurrent fetches never share its staging file."""
+        return _name_locks[hash((os.path.abspath(self.directory), name)) % LOCK_STRIPES]
+
+    def staging_path(self, name):
+        """Where a download of `name` is written before add(); a partial one is resumed from here."""
+        return os.path.join(self.tmp_dir, name)
+
+    def get(self, name):
+        """Returns the path of the verified blob for an attachment name, or None if it is not cached."""
+        with self._lock:
+            row = self._conn.execute("SELECT sha256, size FROM attachments WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        sha256, size = row
+        path = self._blob_path(sha256)
+        if os.path.exists(path) and os.path.getsize(path) == size and file_sha256(path) == sha256:
+            return path
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM attachments WHERE name = ?", (name,))
+        return None
+
+    def sha256(self, name):
+        """Returns the recorded hash for an attachment name, or None, without reading the blob."""
+        with self._lock:
+            row = self._conn.execute("SELECT sha256 FROM attachments WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def add(self, name, path):
+        """Moves a downloaded file into the cache under its hash and returns the blob path."""
+        sha256 = file_sha256(path)
+        size = os.path.getsize(path)
+        blob = self._blob_path(sha256)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        # Identical content under another name is stored once
+        os.replace(path, blob)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO attachments VALUES (?, ?, ?, ?)", (name, sha256, size, time.time())
+            )
+        return blob
@@ -0,0 +1,256 @@
+"""Local HTTP stand-in for the BSE and StockScans endpoints used by the dashboard.
+
+Serves synthetic (or recorded) responses for AnnSubCategoryGetData,
+market-scans/table, market-scans/constituents and attachment downloads, with
+a configurable per-request latency and volume.
+"""
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import announcements_utils
+import market_scans
+
+ANNOUNCEMENTS_PATH = "/BseIndiaAPI/api/AnnSubCategoryGetData/w"
+ATTACHMENT_PATH = "/xml-data/corpfiling/AttachLive/"
+MARKET_SCANS_PATH = "/api/company/market-scans"
+
+FILLER_WORDS = (
+    "the company has informed the exchange regarding intimation under regulation of sebi listing "
+    "obligations and disclosure requirements with reference to above we enclose herewith copy of "
+    "the same for your records please take the above on record"
+).split()
+KEYWORDS = [k for _, _, keywords in announcements_utils.CATEGORY_GROUPS.values() for k in keywords]
+STATUSES = ["Outperforming", "Accumulating", "Consolidating", "Underperforming"]
+
+def synthetic_text(rng, words, keyword_rate=0.02):
+    return " ".join(rng.choice(KEYWORDS) if rng.random() < keyword_rate else rng.choice(FILLER_WORDS) for _ in range(words))
+
+def synthetic_announcements(n, seed=0, start=None, days=1, category="Company Update"):
+    """Returns n announcement rows shaped like the BSE API "Table" records, newest first."""
+    rng = random.Random(seed)
+    start = start or datetime(2024, 1, 1)
+    rows = []
+    for i in range(n):
+        disseminated = start + timedelta(days=days - 1 - (i * days) // max(n, 1), seconds=86399 - (i * 37) % 86400)
+        scrip = 500000 + rng.randrange(4000)
+        rows.append({
+            'NEWSID': f"{seed:08x}-{i:06d}",
+            'SCRIP_CD': scrip,
+            'SLONGNAME': f"Company {scrip} Ltd",
+            'NEWSSUB': f"Company {scrip} Ltd - {scrip} - " + synthetic_text(rng, 6),
+            'HEADLINE': synthetic_text(rng, 15),
+            'MORE': synthetic_text(rng, rng.randint(40, 200)),
+            'CATEGORYNAME': category,
+            'SUBCATNAME': rng.choice(["General", "Press Release / Media Release", "Outcome of Board Meeting", "Investor Presentation"]),
+            'ATTACHMENTNAME': f"{seed:08x}{i:06d}.pdf",
+            'NEWS_DT': disseminated.strftime("%Y-%m-%dT%H:%M:%S"),
+            'DissemDT': disseminated.strftime("%Y-%m-%dT%H:%M:%S.%f")[:23],
+            # Remaining fields of a live API record, unused by the dashboard
+            'XML_NAME': f"{seed:08x}{i:06d}.xml",
+            'DT_TM': disseminated.strftime("%Y-%m-%dT%H:%M:%S.%f")[:23],
+            'News_submission_dt': disseminated.strftime("%Y-%m-%dT%H:%M:%S"),
+            'CRITICALNEWS': 0,
+            'ANNOUNCEMENT_TYPE': "A",
+            'QUARTER_ID': None,
+            'FILESTATUS': "N",
+            'OLD': 1,
+            'RN': i + 1,
+            'PDFFLAG': 0,
+            'NSURL': f"https://www.bseindia.com/stock-share-price/company-{scrip}/{scrip}/",
+            'AGENDA_ID': None,
+            'TotalPageCnt': 1,
+            'TimeDiff': "00:00:01",
+            'Fld_Attachsize': rng.randint(50000, 900000),
+            'AUDIO_VIDEO_FILE': None,
+        })
+    return rows
+
+def synthetic_pdf(name, size, lines=40):
+    """Returns a valid one-page PDF of about `size` bytes whose text is filler seeded by name."""
+    rng = random.Random(name)
+    text = " ".join(f"({synthetic_text(rng, 12)}) Tj T*" for _ in range(lines))
+    stream = f"BT /F1 10 Tf 12 TL 40 800 Td ({name}) Tj T* {text} ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R"
+        b" /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    # A comment line pads the file to the requested size
+    body = b"%PDF-1.4\n%" + b"x" * max(0, size - len(stream) - 800) + b"\n"
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(body))
+        body += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(body)
+    body += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    body += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    body += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return body
+
+def synthetic_scan_rows(n, seed=0, history=60):
+    """Returns n market-scan rows with nested [date, score] historicScores."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        rows.append({
+            'companyId': f"NSE:SYM{seed}X{i}",
+            'name': f"Name {seed}-{i}",
+            'score': round(rng.uniform(0, 100), 2),
+            'status': rng.choice(STATUSES),
+            'historicScores': [[f"2024-01-{d % 28 + 1:02d}", round(rng.uniform(0, 100), 2)] for d in range(history)],
+        })
+    return rows
+
+class FakeServer:
+    """Threaded fake of the BSE and StockScans endpoints.
+
+    rows_per_day controls announcement volume (and therefore page count) per
+    category and day; latency is slept before every response, plus
+    page_latency per page number for announcement pages, modelling offset
+    pagination getting slower the deeper it goes. If
+    recordings_dir holds announcements.json, market_scans_table.json or
+    constituents.json, those recorded payloads are served instead of
+    synthetic ones.
+    """
+
+    def __init__(self, latency=0.0, rows_per_day=100, scan_rows=150, constituent_rows=40,
+                 attachment_size=200 * 1024, recordings_dir=None, page_latency=0.0):
+        self.latency = latency
+        self.page_latency = page_latency
+        self.rows_per_day = rows_per_day
+        self.scan_rows = scan_rows
+        self.constituent_rows = constituent_rows
+        self.attachment_size = attachment_size
+        self.recordings = {}
+        if recordings_dir:
+            for key in ("announcements", "market_scans_table", "constituents"):
+                path = os.path.join(recordings_dir, f"{key}.json")
+                if os.path.exists(path):
+                    with open(path) as f:
+                        self.recordings[key] = json.load(f)
+        self.request_counts = Counter()
+        self._generated = {}
+        self._lock = threading.Lock()
+        self._httpd = None
+        self.url = None
+
+    def _count(self, key):
+        with self._lock:
+            self.request_counts[key] += 1
+
+    def announcement_rows(self, category, subcategory, fromdate, todate):
+        recorded = self.recordings.get("announcements")
+        if recorded is not None:
+            return recorded.get("Table", []) if isinstance(recorded, dict) else recorded
+        key = (category, subcategory, fromdate, todate, self.rows_per_day)
+        with self._lock:
+            rows = self._generated.get(key)
+        if rows is None:
+            # Generated once per range so that every page of it is served from the same rows
+            start = datetime.strptime(fromdate, "%Y%m%d")
+            days = (datetime.strptime(todate, "%Y%m%d") - start).days + 1
+            seed = zlib.crc32(f"{category}|{subcategory}|{fromdate}|{todate}".encode())
+            rows = synthetic_announcements(self.rows_per_day * days, seed=seed, start=start, days=days, category=category)
+            with self._lock:
+                self._generated[key] = rows
+        return rows
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; Nagle would add delayed-ACK stalls
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                time.sleep(server.latency)
+                parts = urlsplit(self.path)
+                if parts.path == ANNOUNCEMENTS_PATH:
+                    server._count("announcements")
+                    query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                    rows = server.announcement_rows(query.get("strCat"), query.get("subcategory"),
+                                                    query.get("strPrevDate"), query.get("strToDate"))
+                    page = int(query.get("pageno", 1))
+                    time.sleep(server.page_latency * page)
+                    size = announcements_utils.PAGE_SIZE
+                    payload = {"Table": rows[(page - 1) * size:page * size], "Table1": [{"ROWCNT": len(rows)}]}
+                    self._send(200, json.dumps(payload).encode())
+                elif parts.path.startswith(ATTACHMENT_PATH):
+                    server._count("attachments")
+                    name = unquote(parts.path[len(ATTACHMENT_PATH):])
+                    self._send(200, synthetic_pdf(name, server.attachment_size), "application/pdf")
+                else:
+                    self._send(404, b"{}")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                time.sleep(server.latency)
+                if self.path == f"{MARKET_SCANS_PATH}/table":
+                    server._count("market_scans_table")
+                    payload = server.recordings.get("market_scans_table") or {
+                        "table": synthetic_scan_rows(server.scan_rows, seed=len(request.get("marketScanType", "")))}
+                    self._send(200, json.dumps(payload).encode())
+                elif self.path == f"{MARKET_SCANS_PATH}/constituents":
+                    server._count("constituents")
+                    payload = server.recordings.get("constituents") or {
+                        "table": synthetic_scan_rows(server.constituent_rows, seed=zlib.crc32(str(request.get("name")).encode()) % 1000)}
+                    self._send(200, json.dumps(payload).encode())
+                else:
+                    self._send(404, b"{}")
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._httpd.server_port}"
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def point_clients_at(self):
+        """Redirects the dashboard's endpoint constants to this server. Returns a function that restores them."""
+        previous = (announcements_utils.BSE_ANNOUNCEMENTS_URL, announcements_utils.BSE_ATTACHMENT_URL,
+                    market_scans.STOCKSCANS_API_URL)
+        announcements_utils.BSE_ANNOUNCEMENTS_URL = self.url + ANNOUNCEMENTS_PATH
+        announcements_utils.BSE_ATTACHMENT_URL = self.url + ATTACHMENT_PATH
+        market_scans.STOCKSCANS_API_URL = self.url + MARKET_SCANS_PATH
+
+        def restore():
+            (announcements_utils.BSE_ANNOUNCEMENTS_URL, announcements_utils.BSE_ATTACHMENT_URL,
+             market_scans.STOCKSCANS_API_URL) = previous
+        return restore
+
+    def __enter__(self):
+        self.start()
+        self._restore = self.point_clients_at()
+        return self
+
+    def __exit__(self, *exc):
+        self._restore()
+        self.stop()
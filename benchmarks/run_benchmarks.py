@@ -0,0 +1,293 @@
+"""Offline benchmarks for the announcement, market-scan and download paths.
+
+Everything runs against benchmarks.fake_server, so no network access is
+needed. Run from the repository root:
+
+    python -m benchmarks.run_benchmarks [--quick] [--latency 0.02] [--repeat 5] [--output bench_output.txt]
+"""
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import pandas as pd
+
+import announcements_utils
+import filing_text
+import market_scans
+import metrics
+import snapshot_store
+import symbol_index
+from announcement_store import AnnouncementStore
+from attachment_cache import AttachmentCache
+from benchmarks.fake_server import FakeServer, synthetic_announcements, synthetic_scan_rows
+
+def percentile(sorted_values, q):
+    """Linear-interpolated percentile of an already sorted list."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+def measure(fn, repeat):
+    """Runs fn `repeat` times and returns the sorted wall times in seconds."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return sorted(times)
+
+class Report:
+    def __init__(self):
+        self.rows = []
+        self.memory_rows = []
+
+    def add(self, name, size, items, unit, times):
+        p50 = percentile(times, 0.5)
+        self.rows.append({
+            'benchmark': name,
+            'size': size,
+            'p50 ms': round(p50 * 1000, 2),
+            'p95 ms': round(percentile(times, 0.95) * 1000, 2),
+            'throughput': f"{items / p50:,.0f} {unit}/s" if p50 else "-",
+        })
+        print(f"  {name:<32} {size:>12}  p50 {p50 * 1000:9.2f} ms", file=sys.stderr)
+
+    def add_memory(self, name, size, before, after):
+        self.memory_rows.append({
+            'frame': name,
+            'size': size,
+            'before MB': round(before / 2 ** 20, 2),
+            'after MB': round(after / 2 ** 20, 2),
+            'reduction': f"{1 - after / before:.0%}" if before else "-",
+        })
+        print(f"  {name:<32} {size:>12}  {before / 2 ** 20:9.2f} -> {after / 2 ** 20:.2f} MB", file=sys.stderr)
+
+    def render(self):
+        text = pd.DataFrame(self.rows).to_string(index=False)
+        if self.memory_rows:
+            text += "\n\nmemory\n" + pd.DataFrame(self.memory_rows).to_string(index=False)
+        return text
+
+def bench_fetch_category_data(report, server, page_counts, repeat):
+    for pages in page_counts:
+        server.rows_per_day = pages * announcements_utils.PAGE_SIZE
+        times = measure(lambda: announcements_utils.fetch_category_data("Company+Update", "20240101", "20240101", "-1"), repeat)
+        report.add("fetch_category_data", f"{pages} pages", server.rows_per_day, "rows", times)
+
+def bench_sharding(report, server, day_counts, repeat):
+    """One range per request versus SHARD_DAYS and per-day shards, with deeper pages answering slower."""
+    server.rows_per_day = 100
+    server.page_latency = 0.002
+    for days in day_counts:
+        to_day = date(2024, 1, 1) + timedelta(days=days - 1)
+        for shard_days in (days, announcements_utils.SHARD_DAYS, 1):
+            times = measure(lambda: announcements_utils.fetch_category_data(
+                "Company+Update", "20240101", to_day.strftime("%Y%m%d"), "-1", shard_days=shard_days), repeat)
+            report.add(f"fetch_category_data shards={shard_days}d", f"{days} days", server.rows_per_day * days, "rows", times)
+    server.page_latency = 0.0
+
+def bench_get_bse_announcements(report, server, day_counts, rows_per_day, repeat):
+    server.rows_per_day = rows_per_day
+    groups = len(announcements_utils.CATEGORY_GROUPS)
+    for days in day_counts:
+        to_day = date(2024, 1, days)
+        times = measure(lambda: announcements_utils.get_bse_announcements(date(2024, 1, 1), to_day), repeat)
+        report.add("get_bse_announcements", f"{days} days", rows_per_day * days * groups, "rows", times)
+
+def peak_bytes(fn):
+    """Peak Python allocation while fn runs."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_streaming(report, server, day_counts, repeat):
+    """Time to the first rows and peak memory of iter_bse_announcements against get_bse_announcements."""
+    server.rows_per_day = 100
+    groups = len(announcements_utils.CATEGORY_GROUPS)
+    for days in day_counts:
+        from_day, to_day = date(2024, 1, 1), date(2024, 1, 1) + timedelta(days=days - 1)
+        rows = server.rows_per_day * days * groups
+
+        def first_chunk():
+            chunks = announcements_utils.iter_bse_announcements(from_day, to_day)
+            next(chunks)
+            chunks.close()
+
+        def drain():
+            for _ in announcements_utils.iter_bse_announcements(from_day, to_day):
+                pass
+
+        times = measure(first_chunk, repeat)
+        report.add("iter_bse_announcements first", f"{days} days", rows, "rows", times)
+        times = measure(drain, repeat)
+        report.add("iter_bse_announcements all", f"{days} days", rows, "rows", times)
+        times = measure(lambda: announcements_utils.get_bse_announcements(from_day, to_day), repeat)
+        report.add("get_bse_announcements", f"{days} days", rows, "rows", times)
+        report.add_memory("peak while fetching (streamed)", f"{days} days",
+                          peak_bytes(lambda: announcements_utils.get_bse_announcements(from_day, to_day)), peak_bytes(drain))
+
+def bench_search(report, frame_sizes, repeat):
+    keywords = announcements_utils.CATEGORY_GROUPS["company_update"][2]
+    for n in frame_sizes:
+        df = pd.DataFrame(synthetic_announcements(n, seed=n))
+        times = measure(lambda: [announcements_utils.search_data(k, df) for k in keywords], repeat)
+        report.add("search_data x keywords", f"{n} rows", n, "rows", times)
+        times = measure(lambda: announcements_utils.classify_data(keywords, df), repeat)
+        report.add("classify_data", f"{n} rows", n, "rows", times)
+
+def bench_link_announcements(report, frame_sizes, repeat):
+    """Joining classified announcements with constituents, interested list and F&O set through the symbol index."""
+    keywords = announcements_utils.CATEGORY_GROUPS["company_update"][2]
+    with tempfile.TemporaryDirectory() as parent:
+        index = symbol_index.SymbolIndex(path=f"{parent}/index.json", scrip_master_path=None)
+        codes = [str(c) for c in range(500000, 504000)]
+        index.add_scrip_master(pd.DataFrame({"Security Code": codes, "Security Id": [f"S{c}" for c in codes],
+                                             "Security Name": [f"Company {c} Ltd" for c in codes]}))
+        constituents = {f"NSE:S{c}": "Bench Sector" for c in codes[::10]}
+        interested = [f"NSE:S{c}" for c in codes[::50]]
+        fno = {f"S{c}" for c in codes[::5]}
+        for n in frame_sizes:
+            df = announcements_utils.compact_announcements(
+                announcements_utils.classify_data(keywords, pd.DataFrame(synthetic_announcements(n, seed=n))))
+            times = measure(lambda: symbol_index.link_announcements(df, index, constituents, interested, fno), repeat)
+            report.add("link_announcements", f"{len(df)} rows", len(df), "rows", times)
+
+def bench_snapshots(report, day_counts, repeat, tables=10, rows=700):
+    """Loading a window of daily constituent snapshots and computing every name's transition."""
+    with tempfile.TemporaryDirectory() as parent:
+        store = snapshot_store.SnapshotStore(f"{parent}/snapshots.db")
+        start = date(2024, 1, 1)
+        for day in range(max(day_counts)):
+            for table in range(tables):
+                store.save("constituents", "Industry", pd.DataFrame(synthetic_scan_rows(rows, seed=day * tables + table)),
+                           source=f"Sector {table}", day=start + timedelta(days=day))
+        for days in day_counts:
+            to_day = start + timedelta(days=days - 1)
+            times = measure(lambda: snapshot_store.transitions(store.load("constituents", "Industry", start, to_day, ends_only=True)), repeat)
+            report.add("snapshot transitions", f"{days} days", days * tables * rows, "rows", times)
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+def bench_memory(report, day_counts, rows_per_day):
+    """Compares the full raw and uncompacted result frames with the pruned and compacted ones."""
+    for days in day_counts:
+        before_raw = after_raw = before_result = after_result = 0
+        for name, (datastr, _, keywords) in announcements_utils.CATEGORY_GROUPS.items():
+            records = synthetic_announcements(rows_per_day * days, seed=len(name), days=days, category=datastr)
+            full = pd.DataFrame(records)
+            pruned = announcements_utils.announcement_frame(records)
+            before_raw += frame_bytes(full)
+            after_raw += frame_bytes(pruned)
+            before_result += frame_bytes(announcements_utils.classify_data(keywords, full))
+            after_result += frame_bytes(announcements_utils.compact_announcements(
+                announcements_utils.classify_data(keywords, pruned)))
+        report.add_memory("raw category frames", f"{days} days", before_raw, after_raw)
+        report.add_memory("classified results", f"{days} days", before_result, after_result)
+
+def bench_clean_scores(report, row_counts, repeat):
+    for n in row_counts:
+        scores = pd.Series([row['historicScores'] for row in synthetic_scan_rows(n, seed=n)])
+        times = measure(lambda: scores.apply(market_scans.clean_scores), repeat)
+        report.add("clean_scores", f"{n} rows", n, "rows", times)
+        times = measure(lambda: market_scans.clean_scores_column(scores), repeat)
+        report.add("clean_scores_column", f"{n} rows", n, "rows", times)
+
+def bench_constituents(report, name_counts, repeat):
+    for n in name_counts:
+        names = [f"Sector {i}" for i in range(n)]
+        times = measure(lambda: market_scans.fetch_constituent_frames(names, "Industry", ""), repeat)
+        report.add("fetch_constituent_frames", f"{n} names", n, "tables", times)
+
+def bench_downloads(report, server, file_counts, repeat):
+    for n in file_counts:
+        df = pd.DataFrame({
+            'LINK': [f"{announcements_utils.BSE_ATTACHMENT_URL}bench{i}.pdf" for i in range(n)],
+            'SLONGNAME': "Bench Co",
+            'TYPE': "Capex",
+        })
+        megabytes = n * server.attachment_size / 2 ** 20
+        # Fresh output directories and attachment caches per run so every file crosses the network
+        with tempfile.TemporaryDirectory() as parent:
+            def cold_download():
+                cache = AttachmentCache(tempfile.mkdtemp(dir=parent))
+                announcements_utils.download_pdfs(df, tempfile.mkdtemp(dir=parent), rate=0, cache=cache)
+            times = measure(cold_download, repeat)
+            report.add("download_pdfs", f"{n} files", megabytes, "MB", times)
+            times = measure(lambda: announcements_utils.download_pdfs_to_zip(
+                df, rate=0, cache=AttachmentCache(tempfile.mkdtemp(dir=parent)))[0].close(), repeat)
+            report.add("download_pdfs_to_zip", f"{n} files", megabytes, "MB", times)
+            # Served from a warm cache: hashing and hardlinking only
+            warm = AttachmentCache(tempfile.mkdtemp(dir=parent))
+            announcements_utils.download_pdfs(df, tempfile.mkdtemp(dir=parent), rate=0, cache=warm)
+            times = measure(lambda: announcements_utils.download_pdfs(df, tempfile.mkdtemp(dir=parent), rate=0, cache=warm), repeat)
+            report.add("download_pdfs (cached)", f"{n} files", megabytes, "MB", times)
+
+def bench_extract_filings(report, server, file_counts, repeat):
+    """Text extraction of cached attachments by the process pool, cold and with nothing left to extract."""
+    if not filing_text.pdf_support():
+        print("  extract_filings skipped: pypdf is not installed", file=sys.stderr)
+        return
+    for n in file_counts:
+        links = [f"{announcements_utils.BSE_ATTACHMENT_URL}bench{i}.pdf" for i in range(n)]
+        names = [link.split('/')[-1] for link in links]
+        with tempfile.TemporaryDirectory() as parent:
+            cache = AttachmentCache(tempfile.mkdtemp(dir=parent))
+            announcements_utils.download_pdfs(pd.DataFrame({'LINK': links, 'SLONGNAME': "Bench Co", 'TYPE': "Capex"}),
+                                              tempfile.mkdtemp(dir=parent), rate=0, cache=cache)
+            times = measure(lambda: filing_text.extract_filings(
+                AnnouncementStore(tempfile.mktemp(dir=parent, suffix=".db")), cache, names), repeat)
+            report.add(f"extract_filings workers={filing_text.EXTRACT_WORKERS}", f"{n} files", n, "files", times)
+            store = AnnouncementStore(tempfile.mktemp(dir=parent, suffix=".db"))
+            filing_text.extract_filings(store, cache, names)
+            times = measure(lambda: filing_text.extract_filings(store, cache, names), repeat)
+            report.add("extract_filings (incremental)", f"{n} files", n, "files", times)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="small data sizes for a fast smoke run")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds of fake server latency per request")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark and size")
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args(argv)
+    # Keep benchmark runs out of the dashboard's metrics dump
+    metrics.METRICS_PATH = None
+
+    if args.quick:
+        sizes = dict(pages=[1, 5], days=[1], frames=[1000], scores=[1000], names=[1, 5], files=[10], memory_days=[5], shard_days=[28], stream_days=[28], snapshot_days=[30])
+    else:
+        sizes = dict(pages=[1, 10, 40], days=[1, 7], frames=[1000, 10000, 50000], scores=[1000, 10000, 50000],
+                     names=[1, 10, 30], files=[20, 100], memory_days=[30, 90], shard_days=[28, 90], stream_days=[28, 90], snapshot_days=[30, 90])
+
+    report = Report()
+    with FakeServer(latency=args.latency) as server:
+        bench_fetch_category_data(report, server, sizes['pages'], args.repeat)
+        bench_get_bse_announcements(report, server, sizes['days'], 100, args.repeat)
+        bench_sharding(report, server, sizes['shard_days'], args.repeat)
+        bench_streaming(report, server, sizes['stream_days'], args.repeat)
+        bench_constituents(report, sizes['names'], args.repeat)
+        bench_downloads(report, server, sizes['files'], args.repeat)
+        bench_extract_filings(report, server, sizes['files'], args.repeat)
+    bench_search(report, sizes['frames'], args.repeat)
+    bench_link_announcements(report, sizes['frames'], args.repeat)
+    bench_snapshots(report, sizes['snapshot_days'], args.repeat)
+    bench_clean_scores(report, sizes['scores'], args.repeat)
+    bench_memory(report, sizes['memory_days'], 300)
+
+    text = f"latency={args.latency}s repeat={args.repeat}\n" + report.render()
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
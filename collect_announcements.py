@@ -0,0 +1,75 @@
+"""Fetches and classifies BSE announcements without the dashboard, for cron runs.
+
+Writes the same table the Corporate Announcements tab builds, so the
+dashboard can load it instead of fetching. Run from the repository root:
+
+    python collect_announcements.py [--from 2024-01-01] [--to 2024-01-05] [--groups company_update,corp_action]
+                                    [--output data/announcements.csv] [--no-store] [--filings] [--timings]
+
+Exits with status 1 if any page could not be fetched; the rows that were
+fetched are still written. With --filings nothing is fetched: the stored rows
+whose attachment text has been extracted are classified by that text too.
+"""
+import argparse
+import sys
+import time
+from datetime import date
+
+import announcements_utils
+import metrics
+from announcement_store import AnnouncementStore
+
+def parse_groups(value):
+    groups = [g.strip() for g in value.split(",") if g.strip()]
+    unknown = [g for g in groups if g not in announcements_utils.CATEGORY_GROUPS]
+    if unknown:
+        choices = ", ".join(announcements_utils.CATEGORY_GROUPS)
+        raise argparse.ArgumentTypeError(f"unknown group(s) {', '.join(unknown)}; choose from {choices}")
+    return groups
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="from_date", type=date.fromisoformat, default=date.today(),
+                        help="first day, YYYY-MM-DD (default today)")
+    parser.add_argument("--to", dest="to_date", type=date.fromisoformat, default=date.today(),
+                        help="last day, YYYY-MM-DD (default today)")
+    parser.add_argument("--groups", type=parse_groups,
+                        help="comma-separated category groups (default all: %s)" % ", ".join(announcements_utils.CATEGORY_GROUPS))
+    parser.add_argument("--output", default=announcements_utils.COLLECTED_PATH,
+                        help="output file; .parquet (needs pyarrow) or .csv (default %(default)s)")
+    parser.add_argument("--no-store", action="store_true", help="fetch every day from BSE instead of reusing the local store")
+    parser.add_argument("--filings", action="store_true",
+                        help="classify stored rows by their extracted filing text instead of fetching")
+    parser.add_argument("--timings", action="store_true", help="print the time, rows and retries of each stage of the run")
+    args = parser.parse_args(argv)
+
+    if args.from_date > args.to_date:
+        parser.error("--from is after --to")
+    if args.filings and args.no_store:
+        parser.error("--filings reads the local store; drop --no-store")
+    if args.output.endswith(".parquet"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("writing .parquet needs pyarrow; install it or use a .csv output")
+
+    store = None if args.no_store else AnnouncementStore()
+    errors = []
+    started = time.perf_counter()
+    with metrics.run(f"collect {args.from_date} to {args.to_date}"):
+        if args.filings:
+            df = announcements_utils.classify_filings(store, args.from_date, args.to_date, groups=args.groups)
+        else:
+            df = announcements_utils.get_bse_announcements(args.from_date, args.to_date, errors=errors,
+                                                           store=store, groups=args.groups)
+    announcements_utils.save_announcements(df, args.output)
+
+    for e in errors:
+        print(f"Could not fetch {e}", file=sys.stderr)
+    print(f"Wrote {len(df)} announcements to {args.output} in {time.perf_counter() - started:.1f}s")
+    if args.timings:
+        print(metrics.stage_summary(metrics.last_run()['events']).to_string(index=False))
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+# Makes the top-level modules importable from tests/
+import metrics
+
+# Tests must not append to data/metrics.jsonl in the working tree
+metrics.METRICS_PATH = None
@@ -0,0 +1,106 @@
+"""Text extraction from downloaded BSE attachments.
+
+Needs the optional pypdf package. Extracted text is kept in the
+AnnouncementStore next to the announcement rows, where it is full-text
+indexed and can be searched with AnnouncementStore.search(..., filings=True).
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import metrics
+
+# Extraction is CPU bound, so one process per core
+EXTRACT_WORKERS = os.cpu_count() or 1
+# Longest text kept per filing; long annual reports are truncated
+MAX_TEXT_CHARS = 500_000
+
+def pdf_support():
+    """True when pypdf is installed."""
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def extract_pdf_text(path, max_chars=MAX_TEXT_CHARS):
+    """Returns the text of every page of a PDF, up to max_chars. Runs in a worker process."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    pages = []
+    size = 0
+    for page in reader.pages:
+        text = page.extract_text() or ''
+        pages.append(text)
+        size += len(text)
+        if size >= max_chars:
+            break
+    return "\n".join(pages)[:max_chars]
+
+def extract_filings(store, cache, names, max_workers=EXTRACT_WORKERS, errors=None):
+    """Extracts the text of cached attachments into the store and returns how many were extracted.
+
+    Incremental: attachments not in the AttachmentCache, or already
+    extracted from the same content (sha256), are skipped, and identical
+    content cached under several names is read once. Files are parsed by
+    up to `max_workers` processes (in this process when that is one) and
+    each result is saved as it arrives. A file that cannot be parsed is
+    saved with its error so it is not retried; errors go to `errors` if
+    given, else printed.
+    """
+    if not pdf_support():
+        raise ImportError("extracting filing text needs pypdf; install it with pip install pypdf")
+
+    names = list(dict.fromkeys(names))
+    done = store.extracted_filings(names)
+    by_sha = {}
+    for name in names:
+        sha256 = cache.sha256(name)
+        if sha256 is not None and done.get(name) != sha256:
+            by_sha.setdefault(sha256, []).append(name)
+    paths = {}
+    for sha256, same in by_sha.items():
+        # Verifies the blob; a damaged one is dropped from the cache and skipped here
+        path = cache.get(same[0])
+        if path:
+            paths[sha256] = path
+    if not paths:
+        return 0
+
+    workers = max(1, min(max_workers, len(paths)))
+
+    def results():
+        # Yields (sha256, text, exception) as each file is parsed
+        if workers == 1:
+            # A single worker process would only add its start-up time
+            for sha256, path in paths.items():
+                try:
+                    yield sha256, extract_pdf_text(path), None
+                except Exception as e:
+                    yield sha256, '', e
+            return
+        # Spawned workers do not inherit the dashboard's threads and locks
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = {executor.submit(extract_pdf_text, path): sha256 for sha256, path in paths.items()}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], '', e
+
+    extracted = 0
+    with metrics.stage('extract_filings', files=len(paths), workers=workers) as info:
+        for sha256, text, exc in results():
+            error = f"{by_sha[sha256][0]}: {exc}" if exc else None
+            if error:
+                if errors is not None:
+                    errors.append(error)
+                else:
+                    print(f"Error extracting text: {error}")
+            for name in by_sha[sha256]:
+                store.save_filing(name, sha256, text, error)
+            extracted += 0 if error else len(by_sha[sha256])
+        info['extracted'] = extracted
+    return extracted
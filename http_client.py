@@ -0,0 +1,179 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# Seconds allowed for connect and for each read, unless a call overrides it
+DEFAULT_TIMEOUT = 30
+# Retries after the first attempt for connection errors, timeouts and RETRY_STATUSES
+MAX_RETRIES = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Exponential backoff: BACKOFF_BASE * 2**attempt seconds, jittered, capped at BACKOFF_MAX
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10.0
+# Concurrent in-flight requests allowed per host
+HOST_CONCURRENCY = {
+    "api.bseindia.com": 8,
+    "www.bseindia.com": 4,
+    "www.stockscans.in": 4,
+    "www.nseindia.com": 2,
+}
+DEFAULT_HOST_CONCURRENCY = 4
+
+BSE_API_HEADERS = {
+    'authority': 'api.bseindia.com',
+    'accept': 'application/json, text/plain, */*',
+    'accept-language': 'en-US,en;q=0.9',
+    'origin': 'https://www.bseindia.com',
+    'referer': 'https://www.bseindia.com/',
+    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36 Edg/117.0.2045.43'
+}
+
+BSE_ATTACHMENT_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+    'Accept-Language': 'en-US,en;q=0.9,en-IN;q=0.8',
+    'Connection': 'keep-alive',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+    'Upgrade-Insecure-Requests': '1',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36 Edg/134.0.0.0',
+    'sec-ch-ua': '"Chromium";v="134", "Not:A-Brand";v="24", "Microsoft Edge";v="134"',
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': '"Windows"'
+}
+
+STOCKSCANS_HEADERS = {
+    'accept': 'application/json',
+    'accept-language': 'en-US,en;q=0.9',
+    'content-type': 'application/json',
+    'origin': 'https://www.stockscans.in',
+    'priority': 'u=1, i',
+    'referer': 'https://www.stockscans.in/market-scans',
+    'sec-ch-ua': '"Google Chrome";v="143", "Chromium";v="143", "Not A(Brand";v="24"',
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': '"Windows"',
+    'sec-fetch-dest': 'empty',
+    'sec-fetch-mode': 'cors',
+    'sec-fetch-site': 'same-origin',
+    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36'
+}
+
+NSE_HEADERS = {
+    'accept': '*/*',
+    'accept-language': 'en-US,en;q=0.9',
+    'referer': 'https://www.nseindia.com/products-services/equity-derivatives-list-underlyings-information',
+    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36'
+}
+
+_lock = threading.Lock()
+_sessions = {}
+_host_slots = {}
+
+def _host(url):
+    return urlsplit(url).netloc
+
+def get_session(host):
+    """Returns the process-wide keep-alive Session for a host, creating it on first use."""
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            pool_size = HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY)
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+        return session
+
+def _host_slot(host):
+    with _lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = threading.BoundedSemaphore(HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY))
+            _host_slots[host] = slot
+        return slot
+
+def backoff_delay(attempt, retry_after=None):
+    """Seconds to wait before retry number `attempt` (0-based), honouring a numeric Retry-After."""
+    if retry_after:
+        try:
+            return min(BACKOFF_MAX, float(retry_after))
+        except ValueError:
+            pass
+    return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+def _send(method, url, retries, timeout, stream, kwargs):
+    """Sends a request on the host session, retrying transient failures. Caller holds the host slot.
+
+    Returns (response, retries_used).
+    """
+    session = get_session(_host(url))
+    for attempt in range(retries + 1):
+        try:
+            response = session.request(method, url, timeout=timeout, stream=stream, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            delay = backoff_delay(attempt, response.headers.get('Retry-After'))
+            response.close()
+            time.sleep(delay)
+            continue
+        return response, attempt
+
+def _record(method, url, started, response, retries, nbytes, error=None):
+    metrics.record(
+        'http', _host(url), method=method, path=urlsplit(url).path,
+        status=response.status_code if response is not None else None,
+        wall=round(time.perf_counter() - started, 6), bytes=nbytes, retries=retries, error=error
+    )
+
+def request(method, url, retries=MAX_RETRIES, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """Performs a request with pooling, retries and the per-host concurrency cap.
+
+    The body is read before returning. Status codes are not checked; call
+    raise_for_status() on the response as with requests.
+    """
+    started = time.perf_counter()
+    with _host_slot(_host(url)):
+        try:
+            response, used = _send(method, url, retries, timeout, False, kwargs)
+        except Exception as e:
+            _record(method, url, started, None, retries, 0, str(e))
+            raise
+    _record(method, url, started, response, used, len(response.content))
+    return response
+
+@contextmanager
+def stream(method, url, retries=MAX_RETRIES, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """Like request() but yields a streaming response; the host slot is held until the body is consumed."""
+    started = time.perf_counter()
+    with _host_slot(_host(url)):
+        try:
+            response, used = _send(method, url, retries, timeout, True, kwargs)
+        except Exception as e:
+            _record(method, url, started, None, retries, 0, str(e))
+            raise
+        try:
+            yield response
+        finally:
+            # Bytes actually read off the wire (before content decoding)
+            nbytes = response.raw.tell() if response.raw is not None else 0
+            response.close()
+            _record(method, url, started, response, used, nbytes)
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
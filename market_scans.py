@@ -0,0 +1,263 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import http_client
+import metrics
+
+STOCKSCANS_API_URL = "https://www.stockscans.in/api/company/market-scans"
+NSE_HOME_URL = "https://www.nseindia.com"
+NSE_FNO_URL = "https://www.nseindia.com/api/underlying-information"
+# Concurrent constituent requests when aggregating several sectors or indices
+CONSTITUENT_WORKERS = 4
+# Number of most recent historicScores points kept for the line charts
+SCORE_HISTORY = 30
+# Last good NSE F&O list, and the age in seconds after which it is refreshed in the background
+FNO_CACHE_PATH = os.path.join("data", "fno_list.json")
+FNO_MAX_AGE = 3600
+# Seconds to wait after a failed refresh before trying NSE again
+FNO_RETRY_INTERVAL = 60
+# Status keywords in the order a status text is matched against them
+STATUS_KEYS = ["outperforming", "accumulating", "consolidating", "underperforming"]
+
+def clean_scores(scores):
+    """Cleans historicScores data for st.column_config.LineChartColumn."""
+    cleaned = []
+    if isinstance(scores, list):
+        recent_scores = scores[-SCORE_HISTORY:] if len(scores) > SCORE_HISTORY else scores
+        for s in recent_scores:
+            if isinstance(s, list) and len(s) > 1:
+                try:
+                    cleaned.append(float(s[1])) 
+                except (ValueError, TypeError):
+                    pass
+            elif isinstance(s, (int, float)):
+                cleaned.append(float(s))
+    return cleaned
+
+def clean_scores_column(scores_col):
+    """Batch equivalent of scores_col.apply(clean_scores).
+
+    Each row's last SCORE_HISTORY entries are converted by one comprehension
+    that skips anything but plain lists. A row that comes out short (it had
+    other entries) or raises (short entries, unparsable scores) is redone by
+    clean_scores itself, so the output is identical.
+    """
+    cleaned = []
+    for scores in scores_col:
+        if not isinstance(scores, list):
+            cleaned.append([])
+            continue
+        recent = scores[-SCORE_HISTORY:]
+        try:
+            values = [float(s[1]) for s in recent if type(s) is list]
+            if len(values) == len(recent):
+                cleaned.append(values)
+                continue
+        except (TypeError, IndexError, ValueError):
+            pass
+        cleaned.append(clean_scores(scores))
+    return pd.Series(cleaned, index=scores_col.index, dtype=object)
+
+def id_column(df):
+    """Name of the symbol/ID column of a market-scan table, or None."""
+    return next((c for c in df.columns if c.lower() in ["companyid", "symbol", "id"]), None)
+
+def status_column(df):
+    return next((c for c in df.columns if c.lower() == "status"), None)
+
+def status_keys(status_col):
+    """First STATUS_KEYS entry contained in each status (case-insensitive), or "" for none."""
+    lowered = status_col.astype("string").fillna("").str.lower()
+    conditions = [lowered.str.contains(key, regex=False).to_numpy(dtype=bool) for key in STATUS_KEYS]
+    return pd.Series(np.select(conditions, STATUS_KEYS, default=""), index=status_col.index)
+
+def fno_mask(ids, fno_symbols):
+    """True where the symbol part of an ID such as 'NSE:SYMBOL' is in fno_symbols."""
+    symbols = ids.astype("string").fillna("").str.rsplit(':', n=1).str[-1]
+    return symbols.isin(fno_symbols).to_numpy(dtype=bool)
+
+def add_flag_columns(df, fno_symbols):
+    """Adds the vectorised '_status' key and 'F&O' flag columns used for styling. Modifies df."""
+    status_col = status_column(df)
+    if status_col:
+        df["_status"] = status_keys(df[status_col])
+    id_col = id_column(df)
+    if id_col:
+        df["F&O"] = fno_mask(df[id_col], fno_symbols)
+    return df
+
+def _stockscans_headers(cookie):
+    headers = dict(http_client.STOCKSCANS_HEADERS)
+    headers['Cookie'] = cookie
+    return headers
+
+@metrics.timed('fetch_market_scan_table', lambda scan_type, cookie: {'scan_type': scan_type})
+def fetch_market_scan_table(scan_type, cookie):
+    """Fetches the StockScans market-scan table ("Industry" or "Index"). Raises on failure."""
+    payload = json.dumps({"marketScanType": scan_type, "timePeriod": "Latest"})
+    response = http_client.post(f"{STOCKSCANS_API_URL}/table", headers=_stockscans_headers(cookie), data=payload)
+    response.raise_for_status()
+    return response.json()
+
+@metrics.timed('fetch_constituents', lambda name, scan_type, cookie: {'scan_type': scan_type, 'source': name})
+def fetch_constituents(name, scan_type, cookie):
+    """Fetches stock constituents for a given sector or index. Raises on failure."""
+    payload = json.dumps({
+        "name": name,
+        "marketScanType": scan_type,
+        "timePeriod": "Latest"
+    })
+    response = http_client.post(f"{STOCKSCANS_API_URL}/constituents", headers=_stockscans_headers(cookie), data=payload)
+    response.raise_for_status()
+    return response.json()
+
+@metrics.timed('fetch_fno_symbols')
+def fetch_fno_symbols():
+    """Fetches the set of symbols in the NSE Futures segment. Raises on failure."""
+    # Mimic browser session by hitting home page first; the host session keeps the cookies
+    http_client.get(NSE_HOME_URL, headers=http_client.NSE_HEADERS, timeout=10)
+    response = http_client.get(NSE_FNO_URL, headers=http_client.NSE_HEADERS, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+
+    symbols = set()
+    if 'data' in data and isinstance(data['data'], dict):
+        underlying = data['data'].get('UnderlyingList', [])
+        indices = data['data'].get('IndexList', [])
+        for item in underlying + indices:
+            if 'symbol' in item:
+                symbols.add(item['symbol'])
+    return symbols
+
+_fno_lock = threading.Lock()
+_fno = {'symbols': None, 'fetched_at': None, 'attempted_at': 0.0, 'refreshing': False, 'error': None}
+
+def _load_fno_cache(path):
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+        return set(cached['symbols']), float(cached['fetched_at'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
+
+def refresh_fno_symbols(path=FNO_CACHE_PATH):
+    """Fetches the F&O list and, if it is non-empty, makes it the cached copy in memory and on disk.
+
+    On failure the last good copy stays in place and the error is kept for fno_status().
+    """
+    try:
+        symbols = fetch_fno_symbols()
+        if not symbols:
+            raise ValueError("NSE returned an empty F&O list")
+        fetched_at = time.time()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'fetched_at': fetched_at, 'symbols': sorted(symbols)}, f)
+        os.replace(path + '.tmp', path)
+        with _fno_lock:
+            _fno.update(symbols=symbols, fetched_at=fetched_at, error=None)
+    except Exception as e:
+        with _fno_lock:
+            _fno['error'] = str(e)
+    finally:
+        with _fno_lock:
+            _fno['refreshing'] = False
+
+def get_fno_symbols(max_age=FNO_MAX_AGE, path=FNO_CACHE_PATH):
+    """Returns the F&O symbol set without waiting on NSE once any copy exists (stale-while-revalidate).
+
+    The last good list is loaded from `path` on first use. When it is older
+    than `max_age` seconds one background refresh is started and the stale
+    list is served meanwhile. Only a first run with no copy at all fetches
+    synchronously; if that fails the set is empty. Failed attempts are
+    retried at most every FNO_RETRY_INTERVAL seconds.
+    """
+    with _fno_lock:
+        if _fno['symbols'] is None:
+            _fno['symbols'], _fno['fetched_at'] = _load_fno_cache(path)
+        symbols, fetched_at = _fno['symbols'], _fno['fetched_at']
+        now = time.time()
+        due = (fetched_at is None or now - fetched_at > max_age) and now - _fno['attempted_at'] > FNO_RETRY_INTERVAL
+        start_refresh = due and not _fno['refreshing']
+        if start_refresh:
+            _fno['refreshing'] = True
+            _fno['attempted_at'] = now
+    if symbols is None:
+        if start_refresh:
+            refresh_fno_symbols(path)
+        with _fno_lock:
+            return set(_fno['symbols'] or ())
+    if start_refresh:
+        threading.Thread(target=refresh_fno_symbols, args=(path,), daemon=True).start()
+    return symbols
+
+def fno_status():
+    """Returns {'count', 'fetched_at', 'age', 'refreshing', 'error'} for the cached F&O list."""
+    with _fno_lock:
+        fetched_at = _fno['fetched_at']
+        return {
+            'count': len(_fno['symbols'] or ()),
+            'fetched_at': fetched_at,
+            'age': time.time() - fetched_at if fetched_at else None,
+            'refreshing': _fno['refreshing'],
+            'error': _fno['error'],
+        }
+
+def rotation_frame(data):
+    """Builds a rotation table from a market-scan table response: cleaned scores, best score first, flag columns."""
+    if not data or "table" not in data:
+        return pd.DataFrame()
+    df = pd.DataFrame(data["table"])
+    if "historicScores" in df.columns:
+        df["historicScores"] = clean_scores_column(df["historicScores"])
+    if "score" in df.columns:
+        df = df.sort_values(by="score", ascending=False)
+    return add_flag_columns(df, get_fno_symbols())
+
+def fetch_rotation_table(scan_type, cookie):
+    """Fetches and builds the rotation table for "Industry" or "Index". Raises on failure."""
+    return rotation_frame(fetch_market_scan_table(scan_type, cookie))
+
+def constituents_frame(data, name):
+    """Builds the constituent table for one sector or index from a constituents response."""
+    if not data or "table" not in data:
+        return pd.DataFrame()
+    sdf = pd.DataFrame(data["table"])
+    if "historicScores" in sdf.columns:
+        sdf["historicScores"] = clean_scores_column(sdf["historicScores"])
+    sdf["Source Name"] = name
+    return sdf
+
+def fetch_constituent_frames(names, scan_type, cookie, max_workers=CONSTITUENT_WORKERS, cache=None, ttl=None):
+    """Fetches constituent tables for several names concurrently.
+
+    Returns (frames, errors): frames maps each successfully fetched name to
+    its table (empty if the response had none), errors maps failed names to
+    their exception. With a SharedCache each table is read from it or
+    loaded into it for `ttl` seconds, once per process however many
+    sessions ask at the same time.
+    """
+    def load(name):
+        return constituents_frame(fetch_constituents(name, scan_type, cookie), name)
+
+    def load_cached(name):
+        return cache.get_or_load(("constituents", scan_type, name), lambda: load(name), ttl)[0]
+
+    frames, errors = {}, {}
+    if not names:
+        return frames, errors
+    with metrics.RunExecutor(max_workers=max(1, min(max_workers, len(names)))) as executor:
+        futures = {name: executor.submit(load_cached if cache is not None else load, name) for name in names}
+        for name, future in futures.items():
+            try:
+                frames[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+    return frames, errors
@@ -0,0 +1,164 @@
+import atexit
+import contextvars
+import functools
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Every event is appended here as one JSON line; set to None to disable the dump
+METRICS_PATH = os.path.join("data", "metrics.jsonl")
+# Past this size the file is rotated to METRICS_PATH + ".1" (replacing the previous one)
+METRICS_MAX_BYTES = 20 * 1024 * 1024
+# Most events the background writer appends per file open
+WRITE_BATCH = 1000
+
+_lock = threading.Lock()
+# The run of the calling thread; a new thread starts outside any run unless handed one by RunExecutor
+_current_run = contextvars.ContextVar('metrics_run', default=None)
+_last_run = None
+_pending = queue.Queue()
+_writer = None
+
+def record(kind, name, **fields):
+    """Records one event ("http" call or pipeline "stage") with its measurements.
+
+    The event joins the calling thread's run, if any, and is queued for the
+    background writer, so callers never wait on disk.
+    """
+    event = {'ts': round(time.time(), 3), 'kind': kind, 'name': name}
+    event.update(fields)
+    current = _current_run.get()
+    if current is not None:
+        event['run'] = current['name']
+        with _lock:
+            current['events'].append(event)
+    if METRICS_PATH:
+        _start_writer()
+        _pending.put((METRICS_PATH, event))
+    return event
+
+def _start_writer():
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, name="metrics-writer", daemon=True)
+            _writer.start()
+
+def _write_loop():
+    while True:
+        batch = [_pending.get()]
+        while len(batch) < WRITE_BATCH:
+            try:
+                batch.append(_pending.get_nowait())
+            except queue.Empty:
+                break
+        lines = {}
+        for path, event in batch:
+            lines.setdefault(path, []).append(json.dumps(event, default=str) + "\n")
+        for path, chunk in lines.items():
+            try:
+                _append(path, chunk)
+            except OSError as e:
+                print(f"Error writing metrics to {path}: {e}")
+        for _ in batch:
+            _pending.task_done()
+
+def _append(path, lines):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    if os.path.exists(path) and os.path.getsize(path) >= METRICS_MAX_BYTES:
+        os.replace(path, path + ".1")
+    with open(path, 'a') as f:
+        f.writelines(lines)
+
+def flush():
+    """Blocks until every recorded event has been written."""
+    _pending.join()
+
+# Events still queued when a command-line run exits are written first
+atexit.register(flush)
+
+class RunExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor whose tasks record into the run of the thread that submitted them."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+@contextmanager
+def stage(name, **fields):
+    """Times a pipeline stage. The yielded dict can be filled with rows, bytes, etc. before exit."""
+    info = dict(fields)
+    started = time.perf_counter()
+    try:
+        yield info
+    except Exception as e:
+        info['error'] = str(e)
+        raise
+    finally:
+        record('stage', name, wall=round(time.perf_counter() - started, 6), **info)
+
+def timed(name, describe=None):
+    """Decorator recording a stage per call; describe(*args, **kwargs) returns extra fields.
+
+    DataFrame results are counted into the stage's rows.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            fields = describe(*args, **kwargs) if describe else {}
+            with stage(name, **fields) as info:
+                result = fn(*args, **kwargs)
+                if isinstance(result, pd.DataFrame):
+                    info['rows'] = len(result)
+            return result
+        return wrapper
+    return decorator
+
+@contextmanager
+def run(name):
+    """Groups the events recorded until exit by this thread, and by its RunExecutor tasks, into one run.
+
+    Runs in other threads (other dashboard sessions, background refreshes)
+    are kept apart. The finished run is also the process-wide last_run().
+    """
+    global _last_run
+    current = {'name': name, 'started': time.time(), 'events': []}
+    token = _current_run.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current['wall'] = time.perf_counter() - started
+        _current_run.reset(token)
+        with _lock:
+            _last_run = current
+
+def last_run():
+    """Returns the most recently finished run in the process ({'name', 'started', 'wall', 'events'}) or None."""
+    with _lock:
+        return _last_run
+
+def stage_summary(events):
+    """Aggregates events per kind and name: calls, total/max wall time, rows, bytes and retries."""
+    if not events:
+        return pd.DataFrame()
+    df = pd.DataFrame(events)
+    for col in ('wall', 'rows', 'bytes', 'retries'):
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0) if col in df.columns else 0
+    summary = df.groupby(['kind', 'name'], sort=False).agg(
+        calls=('wall', 'size'),
+        total_s=('wall', 'sum'),
+        max_s=('wall', 'max'),
+        rows=('rows', 'sum'),
+        bytes=('bytes', 'sum'),
+        retries=('retries', 'sum'),
+    ).reset_index()
+    summary[['rows', 'bytes', 'retries']] = summary[['rows', 'bytes', 'retries']].astype(int)
+    return summary.sort_values('total_s', ascending=False, ignore_index=True)
@@ -0,0 +1,94 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# Seconds between checks for jobs that are due
+TICK_SECONDS = 1.0
+# Jobs refreshing at the same time
+MAX_WORKERS = 4
+
+class Job:
+    """A refresh function with its interval and the outcome of its last run."""
+
+    def __init__(self, name, fn, interval):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.value = None
+        self.refreshed_at = None
+        self.attempted_at = None
+        self.error = None
+        self.lock = threading.Lock()
+
+class Scheduler:
+    """Process-wide scheduler running refresh jobs in background threads.
+
+    Each job runs every `interval` seconds (counted from its last attempt)
+    and keeps the value of its last successful run; a failed run records
+    its error and leaves that value in place. A job never runs twice at
+    once, and refresh() runs one immediately for a manual force-refresh.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._jobs = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="refresh")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, name, fn, interval):
+        self._jobs[name] = Job(name, fn, interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+
+    def _loop(self):
+        while True:
+            now = time.time()
+            for job in self._jobs.values():
+                due = job.attempted_at is None or now - job.attempted_at >= job.interval
+                if due and job.lock.acquire(blocking=False):
+                    self._executor.submit(self._run_locked, job)
+            if self._stop.wait(TICK_SECONDS):
+                return
+
+    def _run_locked(self, job):
+        # Caller holds job.lock
+        try:
+            job.attempted_at = time.time()
+            with metrics.stage('refresh', job=job.name) as info:
+                value = job.fn()
+                # A (value, errors) pair is counted by its value
+                counted = value[0] if isinstance(value, tuple) else value
+                if hasattr(counted, '__len__'):
+                    info['rows'] = len(counted)
+            job.value = value
+            job.refreshed_at = time.time()
+            job.error = None
+        except Exception as e:
+            job.error = str(e)
+        finally:
+            job.lock.release()
+
+    def refresh(self, name):
+        """Runs a job now in the calling thread, or waits for the run already in progress. Returns its status."""
+        job = self._jobs[name]
+        if job.lock.acquire(blocking=False):
+            self._run_locked(job)
+        else:
+            with job.lock:
+                pass
+        return self.status(name)
+
+    def status(self, name):
+        """Returns {'value', 'refreshed_at', 'error', 'running'} for a job."""
+        job = self._jobs[name]
+        return {'value': job.value, 'refreshed_at': job.refreshed_at, 'error': job.error, 'running': job.lock.locked()}
@@ -0,0 +1,143 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Bounds for the process-wide cache; least recently used entries are evicted first
+MAX_ENTRIES = 256
+MAX_BYTES = 512 * 1024 * 1024
+
+def estimate_size(value):
+    """Approximate in-memory size of a cached value in bytes."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) else int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    return sys.getsizeof(value)
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SharedCache:
+    """Thread-safe cache shared by every session of the process.
+
+    Entries expire after their TTL (None keeps them until evicted) and the
+    least recently used ones are evicted once MAX_ENTRIES or MAX_BYTES is
+    exceeded. get_or_load() is single-flight: concurrent callers asking for
+    the same missing key wait for one loader call and share its result.
+    lock() gives the same per-key exclusion to loads that store their result
+    with put() themselves.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # key -> (value, stored_at, expires_at, size)
+        self._flights = {}
+        self._key_locks = {} # key -> [lock, holders and waiters]
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key, now):
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] is not None and entry[2] <= now:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[3]
+
+    def get(self, key):
+        """Returns (value, stored_at) for a live entry, or None."""
+        with self._lock:
+            entry = self._lookup(key, time.time())
+            if entry is None:
+                return None
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, value, ttl=None):
+        """Stores a value and returns its stored_at time."""
+        now = time.time()
+        size = estimate_size(value)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, now, now + ttl if ttl is not None else None, size)
+            self._bytes += size
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+        return now
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Returns (value, stored_at), calling loader() once across all threads when the key is missing.
+
+        A loader exception is raised in every waiting caller and nothing is cached.
+        """
+        with self._lock:
+            entry = self._lookup(key, time.time())
+            if entry is not None:
+                self.hits += 1
+                return entry[0], entry[1]
+            self.misses += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            value = loader()
+            flight.value = (value, self.put(key, value, ttl))
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    @contextmanager
+    def lock(self, key):
+        """Holds a per-key lock shared by all threads, e.g. around a get() / load / put() sequence."""
+        with self._lock:
+            entry = self._key_locks.get(key)
+            if entry is None:
+                entry = self._key_locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
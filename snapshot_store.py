@@ -0,0 +1,123 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date
+
+import pandas as pd
+
+import market_scans
+
+DB_PATH = os.path.join("data", "snapshots.db")
+# Columns kept from each table row; historicScores is itself history and is not stored
+TABLE_COLUMNS = ['name', 'id', 'score', 'status']
+SNAPSHOT_COLUMNS = ['day', 'source'] + TABLE_COLUMNS
+
+class SnapshotStore:
+    """Dated snapshots of the rotation and constituent tables.
+
+    Each fetched table is kept as one snapshot per day (the last fetch of a
+    day replaces earlier ones) holding only the name, ID, score and status
+    of every row. A snapshot is a single zlib-compressed JSON value with
+    one array per column, in a WITHOUT ROWID table clustered on
+    (kind, scan_type, day, source), so a window of days for one kind of
+    table is read with a single range scan and rebuilt column by column.
+    """
+
+    def __init__(self, path=DB_PATH):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                " kind TEXT NOT NULL, scan_type TEXT NOT NULL, day TEXT NOT NULL, source TEXT NOT NULL,"
+                " rows INTEGER NOT NULL, columns BLOB NOT NULL, saved_at REAL NOT NULL,"
+                " PRIMARY KEY (kind, scan_type, day, source)) WITHOUT ROWID"
+            )
+
+    def save(self, kind, scan_type, df, source="", day=None):
+        """Stores today's snapshot of a 'rotation' or 'constituents' table, replacing one saved earlier today."""
+        if df is None or df.empty or "name" not in df.columns:
+            return 0
+        day = (day or date.today()).isoformat()
+        id_col = market_scans.id_column(df)
+        status_col = market_scans.status_column(df)
+        table = pd.DataFrame({
+            'name': df["name"].astype(str),
+            'id': df[id_col].astype(str) if id_col else None,
+            'score': pd.to_numeric(df["score"], errors="coerce").round(4) if "score" in df.columns else None,
+            'status': df[status_col].astype(str) if status_col else None,
+        }).drop_duplicates(subset="name")
+        # NaN is not valid JSON; missing scores are stored as null
+        columns = {c: table[c].astype(object).where(table[c].notna(), None).tolist() for c in TABLE_COLUMNS}
+        blob = zlib.compress(json.dumps(columns, separators=(',', ':')).encode())
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, scan_type, day, source, len(table), blob, time.time())
+            )
+        return len(table)
+
+    def days(self, kind, scan_type):
+        """Days with a snapshot, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT day FROM snapshots WHERE kind = ? AND scan_type = ? ORDER BY day", (kind, scan_type)
+            ).fetchall()
+        return [date.fromisoformat(r[0]) for r in rows]
+
+    def load(self, kind, scan_type, from_day, to_day, ends_only=False):
+        """Snapshot rows from the last snapshot on or before from_day through to_day, oldest day first.
+
+        With `ends_only` just the first and last snapshot of each source in
+        that window are read, which is all transitions() needs.
+        """
+        first, last = from_day.isoformat(), to_day.isoformat()
+        sql = ("SELECT day, source, rows, columns FROM snapshots"
+               " WHERE kind = ? AND scan_type = ? AND day BETWEEN ? AND ?")
+        if ends_only:
+            # Window functions pick the ends per source without reading the blobs in between
+            sql = ("SELECT day, source, rows, columns FROM ("
+                   " SELECT *, MIN(day) OVER w AS first_day, MAX(day) OVER w AS last_day FROM snapshots"
+                   " WHERE kind = ? AND scan_type = ? AND day BETWEEN ? AND ?"
+                   " WINDOW w AS (PARTITION BY source)) WHERE day IN (first_day, last_day)")
+        with self._lock:
+            baseline = self._conn.execute(
+                "SELECT MAX(day) FROM snapshots WHERE kind = ? AND scan_type = ? AND day <= ?", (kind, scan_type, first)
+            ).fetchone()[0]
+            snapshots = self._conn.execute(sql + " ORDER BY day, source", (kind, scan_type, baseline or first, last)).fetchall()
+        data = {c: [] for c in SNAPSHOT_COLUMNS}
+        for day, source, rows, blob in snapshots:
+            data['day'].extend([day] * rows)
+            data['source'].extend([source] * rows)
+            for c, values in json.loads(zlib.decompress(blob)).items():
+                data[c].extend(values)
+        history = pd.DataFrame(data)
+        history['score'] = pd.to_numeric(history['score']).astype('float64')
+        return history
+
+def transitions(history):
+    """Per (source, name): status and score in its first and last snapshot of `history`, and the change.
+
+    `history` is a SnapshotStore.load() frame; ends_only is enough. First
+    and last rows are picked with two drop_duplicates passes and
+    hash-joined, so every name is compared at once. Names missing from
+    their source's first snapshot have no 'status_from'; 'changed' is true
+    when the status differs.
+    """
+    if history.empty:
+        return pd.DataFrame()
+    keys = ['source', 'name']
+    start = history[history['day'] == history.groupby('source')['day'].transform('min')]
+    end = history.drop_duplicates(subset=keys, keep="last")
+    moved = end.merge(start[keys + ['day', 'score', 'status']], on=keys, how="left", suffixes=("_to", "_from"))
+    moved['delta'] = moved['score_to'] - moved['score_from']
+    moved['changed'] = moved['status_from'].notna() & (moved['status_from'] != moved['status_to'])
+    columns = keys + ['id', 'status_from', 'status_to', 'score_from', 'score_to', 'delta', 'changed', 'day_from', 'day_to']
+    return moved[columns].sort_values('delta', ascending=False, na_position="last", ignore_index=True)
@@ -1,216 +1,359 @@
 import streamlit as st
-import requests
-import json
+import functools
 import os
+import time
+import numpy as np
 import pandas as pd
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta
 import announcements_utils
+import filing_text
+import market_scans
+import metrics
+from announcement_store import AnnouncementStore
+from attachment_cache import AttachmentCache
+from scheduler import Scheduler
+from shared_cache import SharedCache
+from snapshot_store import SnapshotStore, transitions
+from symbol_index import SymbolIndex, constituent_sources, link_announcements
 
 # --- Page Config ---
+run_started = time.perf_counter()
 st.set_page_config(layout="wide")
 st.title("Dashboard")
 
 # --- Load External Configurations ---
-def get_auth_cookie():
+def read_auth_cookie():
+    """The StockScans cookie from web_cookie.txt. Returns (cookie, error)."""
     try:
         with open("web_cookie.txt", "r") as f:
-            return f.read().strip()
+            return f.read().strip(), None
     except Exception as e:
-        st.error(f"Error loading web_cookie.txt: {e}")
-        return ""
+        return "", str(e)
 
-STOCKSCANS_COOKIE = get_auth_cookie()
+@st.cache_resource(max_entries=1)
+def get_auth_cookie(mtime):
+    """The StockScans cookie, read once per version (mtime) of web_cookie.txt. Returns (cookie, error)."""
+    return read_auth_cookie()
+
+try:
+    cookie_mtime = os.path.getmtime("web_cookie.txt")
+except OSError:
+    cookie_mtime = None
+STOCKSCANS_COOKIE, cookie_error = get_auth_cookie(cookie_mtime)
+if cookie_error:
+    st.error(f"Error loading web_cookie.txt: {cookie_error}")
+    # A missing file is read again on the next run instead of being cached
+    get_auth_cookie.clear()
+# Seconds a fetched constituent table, and an announcement range, stay fresh in the shared cache
+CONSTITUENT_TTL = 900
+ANNOUNCEMENT_TTL = 900
+# Minimum seconds between redraws of the table while a date range streams in
+STREAM_RENDER_SECONDS = 1.0
+# Seconds between polls while watching today's announcements
+ANNOUNCEMENT_POLL_SECONDS = 60
+# Tables longer than this are shown a page at a time, so a rerun only styles one page
+TABLE_PAGE_ROWS = 500
+TV_CHART_URL = "https://in.tradingview.com/chart/?symbol="
+# Seconds between background refreshes of the shared data sets
+REFRESH_INTERVALS = {
+    "Industry": 300,
+    "Index": 300,
+    "announcements_today": 300,
+    "fno": 600,
+}
+
+@st.cache_resource
+def get_shared_cache():
+    """Process-wide cache of fetched and display-ready tables, shared by every session."""
+    return SharedCache()
+
+@st.cache_resource
+def get_snapshot_store():
+    """Process-wide store of dated rotation and constituent table snapshots."""
+    return SnapshotStore()
+
+@st.cache_resource
+def get_symbol_index():
+    """Process-wide BSE-to-NSE symbol index; learns company names from every constituents table loaded."""
+    return SymbolIndex()
+
+@st.cache_resource
+def get_announcement_store():
+    """Process-wide local store of fetched BSE announcement days."""
+    return AnnouncementStore()
+
+@st.cache_resource
+def get_attachment_cache():
+    """Process-wide content-addressed store of downloaded attachments."""
+    return AttachmentCache()
+
+def refresh_today_announcements(store):
+    """Returns (df, page errors); the rows that were fetched are kept even when some pages failed."""
+    fetch_errors = []
+    df = announcements_utils.get_bse_announcements(date.today(), date.today(), errors=fetch_errors, store=store)
+    if fetch_errors and df.empty:
+        raise RuntimeError(fetch_errors[0])
+    return df, fetch_errors
+
+def refresh_rotation(scan_type, snapshots):
+    # The job outlives the run that scheduled it, so it reads the current cookie itself
+    cookie, error = read_auth_cookie()
+    if error:
+        raise RuntimeError(f"Error loading web_cookie.txt: {error}")
+    df = market_scans.fetch_rotation_table(scan_type, cookie)
+    snapshots.save("rotation", scan_type, df)
+    return df
+
+@st.cache_resource
+def get_scheduler():
+    """Process-wide background refresh of the rotation tables, today's announcements and the F&O list."""
+    scheduler = Scheduler()
+    snapshots = get_snapshot_store()
+    for scan_type in ("Industry", "Index"):
+        # Every refresh also becomes today's snapshot for the change history
+        scheduler.add(scan_type, lambda scan_type=scan_type: refresh_rotation(scan_type, snapshots),
+                      REFRESH_INTERVALS[scan_type])
+    store = get_announcement_store()
+    scheduler.add("announcements_today", lambda: refresh_today_announcements(store), REFRESH_INTERVALS["announcements_today"])
+    # get_fno_symbols refreshes the persisted list itself once it is stale
+    scheduler.add("fno", market_scans.get_fno_symbols, REFRESH_INTERVALS["fno"])
+    return scheduler.start()
+
+def refreshed_caption(status):
+    if status['refreshed_at']:
+        text = f"Last refreshed {datetime.fromtimestamp(status['refreshed_at']):%H:%M:%S}"
+    else:
+        text = "Not loaded yet"
+    if status['running']:
+        text += " (refreshing in the background)"
+    st.caption(text)
+    if status['error']:
+        st.warning(f"Last background refresh failed: {status['error']}")
+    elif isinstance(status['value'], tuple) and status['value'][1]:
+        # A job returning (value, errors) refreshed with some parts missing
+        errors = status['value'][1]
+        st.warning(f"Last refresh is incomplete, {len(errors)} page(s) failed: {errors[0]}")
 
 # --- Session State Initialization ---
+# Tables live in the shared cache; a session keeps only its selections and
+# which refresh or request it is looking at
 states = {
-    "sector_data": None,
+    "sector_data_at": None, # refreshed_at of the rotation table shown
     "selected_sectors": [],
     "interested_sectors": [],
-    "cached_cons_sector": None, # (selection_key_hash, dataframe)
-    "index_data": None,
+    "index_data_at": None,
     "selected_indices": [],
     "interested_indices": [],
-    "cached_cons_index": None
+    "bse_key": None # shared cache key of the announcements shown
 }
 for key, val in states.items():
     if key not in st.session_state:
         st.session_state[key] = val
 
 # --- Global Helpers ---
-def clean_scores(scores):
-    """Cleans historicScores data for st.column_config.LineChartColumn."""
-    cleaned = []
-    if isinstance(scores, list):
-        recent_scores = scores[-30:] if len(scores) > 30 else scores
-        for s in recent_scores:
-            if isinstance(s, list) and len(s) > 1:
-                try:
-                    cleaned.append(float(s[1])) 
-                except (ValueError, TypeError):
-                    pass
-            elif isinstance(s, (int, float)):
-                cleaned.append(float(s))
-    return cleaned
-
-def fetch_constituents(name, scan_type="Industry"):
-    """Fetches stock constituents for a given sector or index."""
-    url = "https://www.stockscans.in/api/company/market-scans/constituents"
-    payload = json.dumps({
-        "name": name,
-        "marketScanType": scan_type,
-        "timePeriod": "Latest"
-    })
-    headers = {
-        'accept': 'application/json',
-        'accept-language': 'en-US,en;q=0.9',
-        'content-type': 'application/json',
-        'origin': 'https://www.stockscans.in',
-        'priority': 'u=1, i',
-        'referer': 'https://www.stockscans.in/market-scans',
-        'sec-ch-ua': '"Google Chrome";v="143", "Chromium";v="143", "Not A(Brand";v="24"',
-        'sec-ch-ua-mobile': '?0',
-        'sec-ch-ua-platform': '"Windows"',
-        'sec-fetch-dest': 'empty',
-        'sec-fetch-mode': 'cors',
-        'sec-fetch-site': 'same-origin',
-        'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36',
-        'Cookie': STOCKSCANS_COOKIE
-    }
-    try:
-        response = requests.request("POST", url, headers=headers, data=payload)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        st.error(f"Error fetching constituents for {name}: {e}")
-        return None
+def record_rerun(name, wall):
+    """Keeps the wall time of the last run of the app or one of its fragments for the Diagnostics panel."""
+    st.session_state.setdefault('rerun_times', {})[name] = wall
+    metrics.record('rerun', name, wall=round(wall, 6))
+
+@contextmanager
+def session_run(name):
+    """A metrics.run() kept as this session's last run, for its Diagnostics panel."""
+    with metrics.run(name) as current:
+        try:
+            yield current
+        finally:
+            st.session_state['last_run'] = current
+
+def run_fragment(name, fn, *args, run_every=None):
+    """Runs fn(*args) as a fragment, so its widgets rerun only fn, and times every run of it under `name`."""
+    @functools.wraps(fn)
+    def timed(*args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            record_rerun(name, time.perf_counter() - started)
+    return st.fragment(timed, run_every=run_every)(*args)
 
-@st.cache_data(ttl=3600)
 def get_fno_list():
-    """Fetches the list of symbols in the Futures segment from NSE."""
-    url = "https://www.nseindia.com/api/underlying-information"
-    headers = {
-        'accept': '*/*',
-        'accept-language': 'en-US,en;q=0.9',
-        'referer': 'https://www.nseindia.com/products-services/equity-derivatives-list-underlyings-information',
-        'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36'
-    }
-    try:
-        session = requests.Session()
-        # Mimic browser session by hitting home page first
-        session.get("https://www.nseindia.com", headers=headers, timeout=10)
-        response = session.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        symbols = set()
-        if 'data' in data and isinstance(data['data'], dict):
-            underlying = data['data'].get('UnderlyingList', [])
-            indices = data['data'].get('IndexList', [])
-            for item in underlying + indices:
-                if 'symbol' in item:
-                    symbols.add(item['symbol'])
-        return symbols
-    except Exception as e:
-        st.sidebar.error(f"Error fetching NSE F&O list: {e}")
-        return set()
-
-def get_status_color(val):
-    if not isinstance(val, str): return ""
-    v = val.lower()
-    if "outperforming" in v: return "background-color: #ccffcc; color: #006600"
-    if "accumulating" in v: return "background-color: #cce5ff; color: #004085"
-    if "consolidating" in v: return "background-color: #ffe5cc; color: #856404"
-    if "underperforming" in v: return "background-color: #ffcccc; color: #cc0000"
-    return ""
-
-def highlight_fno(val, fno_list):
-    """Styles a cell green if the symbol is in the F&O list."""
-    if not isinstance(val, str): return ""
-    # Extract symbol from 'NSE:SYMBOL' or similar
-    symbol = val.split(':')[-1]
-    if symbol in fno_list:
-        return "background-color: #d1f7d1; color: #006600; font-weight: bold;"
-    return ""
+    """Symbols in the NSE Futures segment, served from the persisted cache and refreshed in the background."""
+    return market_scans.get_fno_symbols()
+
+# Rotation change periods: label -> days back from the latest snapshot
+CHANGE_PERIODS = {"Previous day": 1, "1 week": 7, "1 month": 30}
+
+# Announcement filters by linked stock: label -> column added by link_announcements
+LINK_FILTERS = {"Selected constituents": "Constituent Of", "Interested list": "Interested", "F&O stocks": "F&O"}
+
+def linked_announcements(bse_key, bse_df):
+    """Announcements joined with this session's selected constituents, interested list and the F&O set."""
+    cache = get_shared_cache()
+    frames = []
+    for scan_type, selection_key in (("Industry", "selected_sectors"), ("Index", "selected_indices")):
+        for name in st.session_state[selection_key]:
+            part = cache.get(("constituents", scan_type, name))
+            if part is not None:
+                frames.append(part[0])
+    sources = constituent_sources(frames)
+    interested = st.session_state["interested_sectors"] + st.session_state["interested_indices"]
+    index = get_symbol_index()
+    if bse_key[0] == "partial":
+        # Only this session holds a partial result, under a key that is not unique to it
+        return link_announcements(bse_df, index, sources, interested, get_fno_list())
+    # Shared by sessions with the same announcements, selections and index size
+    key = ("linked", bse_key, tuple(sorted(sources.items())), tuple(sorted(interested)),
+           market_scans.fno_status()['fetched_at'], len(index.by_code), len(index.by_name))
+    return cache.get_or_load(key, lambda: link_announcements(bse_df, index, sources, interested, get_fno_list()),
+                             ANNOUNCEMENT_TTL)[0]
+
+STATUS_STYLES = {
+    "outperforming": "background-color: #ccffcc; color: #006600",
+    "accumulating": "background-color: #cce5ff; color: #004085",
+    "consolidating": "background-color: #ffe5cc; color: #856404",
+    "underperforming": "background-color: #ffcccc; color: #cc0000",
+}
+FNO_STYLE = "background-color: #d1f7d1; color: #006600; font-weight: bold;"
+
+def flag_styles(view, id_col=None, status_col=None):
+    """CSS for a table page, taken from its precomputed '_status' and 'F&O' columns."""
+    css = pd.DataFrame("", index=view.index, columns=view.columns)
+    if status_col and "_status" in view.columns:
+        css[status_col] = view["_status"].map(STATUS_STYLES).fillna("")
+    if id_col and "F&O" in view.columns:
+        css[id_col] = np.where(view["F&O"], FNO_STYLE, "")
+    return css
+
+def show_table(df, key, column_config, id_col=None, status_col=None, columns=None):
+    """Renders a selectable table styled from its flag columns, paged past TABLE_PAGE_ROWS rows.
+
+    Returns the selected rows as positions in df, across all pages.
+    """
+    offset = 0
+    page_rows = None
+    selection_default = None
+    if len(df) > TABLE_PAGE_ROWS:
+        pages = -(-len(df) // TABLE_PAGE_ROWS)
+        page = st.number_input(f"Page (1-{pages})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+        offset = (page - 1) * TABLE_PAGE_ROWS
+        st.caption(f"Rows {offset + 1}-{min(offset + TABLE_PAGE_ROWS, len(df))} of {len(df)}")
+        # Only the shown page has a table widget, so each page's selection is kept
+        # here and restored when the page is shown again
+        page_rows = st.session_state.setdefault(f"{key}_rows", {})
+        restored = [r - offset for r in page_rows.get(page, []) if r < len(df)]
+        if restored:
+            selection_default = {"selection": {"rows": restored}}
+        key = f"{key}_{page}" if page > 1 else key
+    view = df.iloc[offset:offset + TABLE_PAGE_ROWS]
+    event = st.dataframe(
+        view.style.apply(flag_styles, axis=None, id_col=id_col, status_col=status_col),
+        column_config=column_config,
+        column_order=[c for c in (columns or view.columns) if c != "_status"],
+        use_container_width=True, hide_index=True, on_select="rerun", selection_mode="multi-row", key=key,
+        selection_default=selection_default
+    )
+    rows = [offset + r for r in event.selection.rows]
+    if page_rows is None:
+        return rows
+    page_rows[page] = rows
+    return sorted(r for kept in page_rows.values() for r in kept if r < len(df))
+
+def rotation_view(scan_type, refreshed_at):
+    """The display-ready rotation table of one background refresh, built once per process, or None."""
+    key = ("rotation_view", scan_type, refreshed_at)
+    cached = get_shared_cache().get(key)
+    if cached:
+        return cached[0]
+    status = get_scheduler().status(scan_type)
+    if refreshed_at is None or status['refreshed_at'] != refreshed_at:
+        return None
+
+    def build():
+        df = status['value'].copy()
+        id_col = market_scans.id_column(df)
+        if id_col:
+            # Transform the ID column values into clickable TradingView URLs
+            df[id_col] = TV_CHART_URL + df[id_col].astype(str)
+        return df
+    return get_shared_cache().get_or_load(key, build, REFRESH_INTERVALS[scan_type] * 2)[0]
+
+def render_rotation_changes(scan_type, data_key):
+    """Status transitions and score changes of every name against an earlier snapshot."""
+    snapshots = get_snapshot_store()
+    with st.expander("Status and Score Changes"):
+        days = snapshots.days("rotation", scan_type)
+        if len(days) < 2:
+            st.caption(f"Snapshots are saved on every refresh; changes appear once there is more than one day"
+                       + (f" (first: {days[0]:%d %b %Y})." if days else "."))
+            return
+        c1, c2 = st.columns(2)
+        with c1: period = st.selectbox("Compared With", list(CHANGE_PERIODS), key=f"{data_key}_change_period")
+        with c2: only_changed = st.checkbox("Only status changes", key=f"{data_key}_only_changed")
+        to_day = days[-1]
+        changes = transitions(snapshots.load("rotation", scan_type, to_day - timedelta(days=CHANGE_PERIODS[period]), to_day, ends_only=True))
+        if changes.empty:
+            return
+        if only_changed:
+            changes = changes[changes['changed']]
+        st.caption(f"{int(changes['changed'].sum())} status changes between {changes['day_from'].min()} and {to_day}.")
+        cols = ['name', 'status_from', 'status_to', 'score_from', 'score_to', 'delta']
+        st.dataframe(changes[cols], hide_index=True, use_container_width=True, key=f"{data_key}_changes_table",
+                     column_config={"delta": st.column_config.NumberColumn("Δ score", format="%+.2f")})
 
 def render_rotation_tab(tab_name, data_key, selection_key, scan_type):
+    """Runs as a fragment; only a changed selection reruns the app, to update its constituents tab."""
+    selection = list(st.session_state[selection_key])
     st.header(tab_name)
     st.text("Outperforming → Strength is visible and persistent")
     st.text("Accumulating → Early signs of strength are emerging")
     st.text("Consolidating → Momentum is slowing down")
     st.text("Underperforming → Persistent weakness remains")
 
-    if st.button(f"Fetch {tab_name} Data"):
-        url = "https://www.stockscans.in/api/company/market-scans/table"
-        payload = json.dumps({"marketScanType": scan_type, "timePeriod": "Latest"})
-        headers = {
-          'accept': 'application/json',
-          'accept-language': 'en-US,en;q=0.9',
-          'content-type': 'application/json',
-          'origin': 'https://www.stockscans.in',
-          'priority': 'u=1, i',
-          'referer': 'https://www.stockscans.in/market-scans',
-          'sec-ch-ua': '"Google Chrome";v="143", "Chromium";v="143", "Not A(Brand";v="24"',
-          'sec-ch-ua-mobile': '?0',
-          'sec-ch-ua-platform': '"Windows"',
-          'sec-fetch-dest': 'empty',
-          'sec-fetch-mode': 'cors',
-          'sec-fetch-site': 'same-origin',
-          'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36',
-          'Cookie': STOCKSCANS_COOKIE
-        }
-        with st.spinner("Fetching..."):
-            try:
-                response = requests.request("POST", url, headers=headers, data=payload)
-                response.raise_for_status()
-                data = response.json()
-                if data and "table" in data:
-                    df = pd.DataFrame(data["table"])
-                    if "historicScores" in df.columns:
-                        df["historicScores"] = df["historicScores"].apply(clean_scores)
-                    if "score" in df.columns:
-                        df = df.sort_values(by="score", ascending=False)
-                    st.session_state[data_key] = df
-                    st.session_state[selection_key] = []
-                else:
-                    st.warning("No data found.")
-            except Exception as e:
-                st.error(f"Error: {e}")
+    def adopt(status):
+        st.session_state[f"{data_key}_at"] = status['refreshed_at']
+
+    scheduler = get_scheduler()
+    if st.button(f"Refresh {tab_name} Data"):
+        with st.spinner("Fetching..."), session_run(f"{tab_name} table"):
+            status = scheduler.refresh(scan_type)
+        if status['error']:
+            st.error(f"Error: {status['error']}")
+        elif status['value'] is None or status['value'].empty:
+            st.warning("No data found.")
+        else:
+            adopt(status)
+            st.session_state[selection_key] = []
+    status = scheduler.status(scan_type)
+    has_data = status['value'] is not None and not status['value'].empty
+    if has_data and status['refreshed_at'] != st.session_state[f"{data_key}_at"]:
+        # A background refresh is shown straight away unless it would disturb a selection
+        if st.session_state[f"{data_key}_at"] is None or not st.session_state[selection_key]:
+            adopt(status)
+        elif st.button("Load Refreshed Data", key=f"{data_key}_load_latest"):
+            adopt(status)
+            st.session_state[selection_key] = []
+    refreshed_caption(status)
 
-    if st.session_state[data_key] is not None:
-        df = st.session_state[data_key].copy() # Copy to avoid mutation issues
+    df = rotation_view(scan_type, st.session_state[f"{data_key}_at"])
+    if df is None and has_data:
+        # The refresh this session was showing is no longer held anywhere
+        adopt(status)
+        df = rotation_view(scan_type, status['refreshed_at'])
+    if df is not None:
         
         column_config = {
             "historicScores": st.column_config.LineChartColumn("Historic Scores (1M)", width="medium")
         }
 
         # Handle ID Column Hyperlinking
-        id_col = next((c for c in df.columns if c.lower() in ["companyid", "symbol", "id"]), None)
+        id_col = market_scans.id_column(df)
         if id_col:
-            # Transform the ID column values into clickable TradingView URLs
-            df[id_col] = "https://in.tradingview.com/chart/?symbol=" + df[id_col].astype(str)
             column_config[id_col] = st.column_config.LinkColumn(id_col, display_text=r"symbol=(.*)")
             
-        status_col = next((c for c in df.columns if c.lower() == "status"), None)
-        
-        # Prepare display dataframe with F&O highlighting
-        fno_list = get_fno_list()
-        if id_col:
-            # Apply styling to the ID column (which now contains URLs)
-            display_df = df.style.map(get_status_color, subset=[status_col] if status_col else [])
-            display_df = display_df.map(
-                lambda x: highlight_fno(x.split('=')[-1] if isinstance(x, str) else x, fno_list),
-                subset=[id_col]
-            )
-        else:
-            display_df = df.style.map(get_status_color, subset=[status_col] if status_col else [])
-        
-        event = st.dataframe(
-            display_df,
-            column_config=column_config,
-            use_container_width=True, hide_index=True, on_select="rerun", selection_mode="multi-row", key=f"{data_key}_table"
-        )
-        if event.selection.rows:
-            new_selection = df.iloc[event.selection.rows]["name"].tolist()
+        selected_rows = show_table(df, f"{data_key}_table", column_config, id_col, market_scans.status_column(df))
+        if selected_rows:
+            new_selection = df.iloc[selected_rows]["name"].tolist()
             if new_selection != st.session_state[selection_key]:
                 st.session_state[selection_key] = new_selection
                 # Clear interested list when parent selection changes
@@ -223,45 +366,85 @@ def render_rotation_tab(tab_name, data_key, selection_key, scan_type):
                 prefix = data_key.split('_')[0]
                 st.session_state[f"interested_{prefix}s"] = []
     else:
-        st.info(f"Click 'Fetch {tab_name} Data' to load.")
+        st.info(f"Loading in the background; click 'Refresh {tab_name} Data' to fetch now.")
+    if st.session_state[selection_key] != selection:
+        st.rerun()
+    run_fragment(f"{tab_name} changes", render_rotation_changes, scan_type, data_key)
+
+def render_constituents_table(final_df, selection_key, id_col):
+    """The constituents table and its Add button; a fragment of its own, so a row click leaves the copy buttons alone."""
+    cols = ["Source Name"]
+    if "TV Link" in final_df.columns: cols.append("TV Link")
+    cols += [c for c in final_df.columns if c not in cols]
+
+    selected_rows = show_table(
+        final_df, f"{selection_key}_details_table",
+        column_config={
+            "historicScores": st.column_config.LineChartColumn("Historic Scores (1M)", width="medium"), 
+            "TV Link": st.column_config.LinkColumn("TradingView", display_text=r"symbol=(.*)")
+        },
+        id_col=id_col, columns=cols
+    )
+
+    # --- FEATURE 3: Interested List (Manual Trigger) ---
+    interested_key = f"interested_{selection_key.split('_')[1]}"
+
+    if st.button("Add Selected to Interested List", key=f"btn_{selection_key}"):
+        if selected_rows:
+            selected_indices = selected_rows
+            # Extract raw IDs (before hyperlinking if needed, but here we just need the values)
+            # Note: final_df still has the raw ID values if we haven't overwritten them 
+            # in a way that breaks extraction. The render_constituents_tab logic 
+            # doesn't hyperlink the IDs in final_df[cols] display as URLs like the rotation tabs do.
+            # It creates a separate "TV Link" column.
+            st.session_state[interested_key] = final_df.iloc[selected_indices][id_col].dropna().unique().tolist()
+            # The announcements tab filters on the interested list too
+            st.rerun()
+        else:
+            st.warning("Please select rows in the table above first.")
 
 def render_constituents_tab(header, selection_key, scan_type):
     st.header(header)
     selected = st.session_state.get(selection_key, [])
     if selected:
         # --- Caching Mechanism ---
-        cache_key = f"cached_cons_{selection_key.split('_')[1]}" # sector or index
-        selection_hash = ",".join(sorted(selected))
-        
-        cached_data = st.session_state.get(cache_key)
-        if cached_data and cached_data[0] == selection_hash:
-            final_df = cached_data[1]
-        else:
-            st.write(f"Aggregating data for: {', '.join(selected)}")
-            all_dfs = []
-            progress = st.progress(0)
-            for i, name in enumerate(selected):
-                data = fetch_constituents(name, scan_type=scan_type)
-                if data and "table" in data:
-                    sdf = pd.DataFrame(data["table"])
-                    if "historicScores" in sdf.columns:
-                        sdf["historicScores"] = sdf["historicScores"].apply(clean_scores)
-                    sdf["Source Name"] = name
-                    all_dfs.append(sdf)
-                progress.progress((i + 1) / len(selected))
-            progress.empty()
-            
-            if all_dfs:
-                final_df = pd.concat(all_dfs, ignore_index=True)
-                # Default sort by score descending
-                if "score" in final_df.columns:
-                    final_df = final_df.sort_values(by="score", ascending=False)
-                st.session_state[cache_key] = (selection_hash, final_df)
-            else:
-                final_df = pd.DataFrame()
+        # Each constituent table is cached process-wide for CONSTITUENT_TTL seconds,
+        # so changing the selection only fetches the names no session has fetched yet.
+        cache = get_shared_cache()
+        missing = [n for n in selected if cache.get(("constituents", scan_type, n)) is None]
+        if missing:
+            st.write(f"Aggregating data for: {', '.join(missing)}")
+            with st.spinner("Fetching..."), session_run(f"{header} ({len(missing)} tables)"):
+                frames, errors = market_scans.fetch_constituent_frames(missing, scan_type, STOCKSCANS_COOKIE,
+                                                                       cache=cache, ttl=CONSTITUENT_TTL)
+            for name, frame in frames.items():
+                get_snapshot_store().save("constituents", scan_type, frame, source=name)
+            for name, e in errors.items():
+                st.error(f"Error fetching constituents for {name}: {e}")
+
+        parts = [p for p in (cache.get(("constituents", scan_type, n)) for n in selected) if p is not None]
+        # The assembled table is shared until the selection, one of its parts or the F&O list changes
+        selection_hash = (",".join(sorted(selected)), tuple(sorted(stored_at for _, stored_at in parts)),
+                          market_scans.fno_status()['fetched_at'])
+
+        def assemble():
+            all_dfs = [sdf for sdf, _ in parts if not sdf.empty]
+            if not all_dfs:
+                return pd.DataFrame()
+            final_df = pd.concat(all_dfs, ignore_index=True)
+            # Default sort by score descending
+            if "score" in final_df.columns:
+                final_df = final_df.sort_values(by="score", ascending=False)
+            market_scans.add_flag_columns(final_df, get_fno_list())
+            get_symbol_index().add_constituents(final_df)
+            id_col = market_scans.id_column(final_df)
+            if id_col:
+                final_df["TV Link"] = TV_CHART_URL + final_df[id_col].astype(str)
+            return final_df
+        final_df = cache.get_or_load(("constituents_view", scan_type, selection_hash), assemble, CONSTITUENT_TTL)[0]
 
         if not final_df.empty:
-            id_col = next((c for c in final_df.columns if c.lower() in ["companyid", "symbol", "id"]), None)
+            id_col = market_scans.id_column(final_df)
             if id_col:
                 ids_string = ", ".join(map(str, final_df[id_col].dropna().unique().tolist()))
                 st.subheader("Copy Identifiers")
@@ -269,53 +452,10 @@ def render_constituents_tab(header, selection_key, scan_type):
                 <script>document.getElementById('copyBtn').onclick=function(){{navigator.clipboard.writeText('{ids_string}').then(function(){{const b=document.getElementById('copyBtn');b.innerText='Copied!';b.style.backgroundColor='#28a745';setTimeout(function(){{b.innerText='Copy IDs';b.style.backgroundColor='#007bff';}},2000);}});}};</script>"""
                 st.components.v1.html(copy_html, height=50)
                 st.code(ids_string, language="")
-                final_df["TV Link"] = "https://in.tradingview.com/chart/?symbol=" + final_df[id_col].astype(str)
 
-            cols = ["Source Name"]
-            if "TV Link" in final_df.columns: cols.append("TV Link")
-            cols += [c for c in final_df.columns if c not in cols]
-            
-            # Prepare display dataframe with F&O highlighting
-            fno_list = get_fno_list()
-            display_df = final_df[cols]
-            
-            if id_col:
-                # Apply styling to the ID column
-                styled_df = display_df.style.map(
-                    lambda x: highlight_fno(x, fno_list),
-                    subset=[id_col] if id_col in cols else []
-                )
-            else:
-                styled_df = display_df
-
-            event = st.dataframe(
-                styled_df, 
-                use_container_width=True, 
-                hide_index=True, 
-                key=f"{selection_key}_details_table",
-                on_select="rerun", # Keep "rerun" but data is now cached so it's fast
-                selection_mode="multi-row",
-                column_config={
-                    "historicScores": st.column_config.LineChartColumn("Historic Scores (1M)", width="medium"), 
-                    "TV Link": st.column_config.LinkColumn("TradingView", display_text=r"symbol=(.*)")
-                }
-            )
-
-            # --- FEATURE 3: Interested List (Manual Trigger) ---
-            interested_key = f"interested_{selection_key.split('_')[1]}"
-            
-            if st.button("Add Selected to Interested List", key=f"btn_{selection_key}"):
-                if event.selection.rows:
-                    selected_indices = event.selection.rows
-                    # Extract raw IDs (before hyperlinking if needed, but here we just need the values)
-                    # Note: final_df still has the raw ID values if we haven't overwritten them 
-                    # in a way that breaks extraction. The render_constituents_tab logic 
-                    # doesn't hyperlink the IDs in final_df[cols] display as URLs like the rotation tabs do.
-                    # It creates a separate "TV Link" column.
-                    st.session_state[interested_key] = final_df.iloc[selected_indices][id_col].dropna().unique().tolist()
-                else:
-                    st.warning("Please select rows in the table above first.")
+            run_fragment(f"{header} table", render_constituents_table, final_df, selection_key, id_col)
 
+            interested_key = f"interested_{selection_key.split('_')[1]}"
             interested_ids = st.session_state.get(interested_key, [])
             if interested_ids:
                 interested_string = ", ".join(map(str, interested_ids))
@@ -340,41 +480,206 @@ def render_constituents_tab(header, selection_key, scan_type):
         st.info("Select items in the rotation tab first.")
 
 # --- Tabs ---
+# Each tab's interactive part is a fragment: selecting rows or changing a filter
+# reruns only that part, not the other tabs and their styled tables
 tabs = st.tabs(["Sector Rotation", "Sector Constituents", "Index Rotation", "Index Constituents", "Corp Announcements", "Screeners"])
 t_sec, t_sec_det, t_ind, t_ind_det, t_ann, t_scr = tabs
 
-with t_sec: render_rotation_tab("Sector Rotation", "sector_data", "selected_sectors", "Industry")
-with t_sec_det: render_constituents_tab("Sector Constituents", "selected_sectors", "Industry")
-with t_ind: render_rotation_tab("Index Rotation", "index_data", "selected_indices", "Index")
-with t_ind_det: render_constituents_tab("Index Constituents", "selected_indices", "Index")
+with t_sec: run_fragment("Sector Rotation", render_rotation_tab, "Sector Rotation", "sector_data", "selected_sectors", "Industry")
+with t_sec_det: run_fragment("Sector Constituents", render_constituents_tab, "Sector Constituents", "selected_sectors", "Industry")
+with t_ind: run_fragment("Index Rotation", render_rotation_tab, "Index Rotation", "index_data", "selected_indices", "Index")
+with t_ind_det: run_fragment("Index Constituents", render_constituents_tab, "Index Constituents", "selected_indices", "Index")
 
-with t_ann:
+def stream_announcements(d_from, d_to, errors):
+    """Fetches a date range shard by shard, showing the table as it grows while the rest load."""
+    progress = st.progress(0.0, text="Fetching announcements...")
+    preview = st.empty()
+    chunks = []
+    rendered_at = 0.0
+    with session_run(f"Announcements {d_from} to {d_to}"):
+        for done, total, chunk in announcements_utils.iter_bse_announcements(d_from, d_to, errors=errors, store=get_announcement_store()):
+            if not chunk.empty:
+                chunks.append(chunk)
+            found = sum(len(c) for c in chunks)
+            progress.progress(done / total, text=f"Fetched {done} of {total} shards, {found} announcements so far...")
+            # Re-sending the growing table is throttled; the full table with filters replaces it at the end
+            if chunks and time.time() - rendered_at >= STREAM_RENDER_SECONDS:
+                preview.dataframe(pd.concat(chunks, ignore_index=True), column_config={"LINK": st.column_config.LinkColumn("PDF", display_text="Open")},
+                                  use_container_width=True, hide_index=True)
+                rendered_at = time.time()
+    progress.empty()
+    preview.empty()
+    if not chunks:
+        return pd.DataFrame()
+    return announcements_utils.compact_announcements(pd.concat(chunks, ignore_index=True))
+
+def render_announcements():
+    """Fetching, filtering and downloading announcements; runs as a fragment."""
     st.header("Corporate Announcements")
     c1, c2 = st.columns(2)
     with c1: d_from = st.date_input("From Date", date.today())
     with c2: d_to = st.date_input("To Date", date.today())
-    if 'bse_data' not in st.session_state: st.session_state['bse_data'] = pd.DataFrame()
+    today_only = d_from == d_to == date.today()
     if st.button("Fetch Announcements"):
-        with st.spinner("Fetching..."):
-            st.session_state['bse_data'] = announcements_utils.get_bse_announcements(d_from, d_to)
-            st.session_state['bse_fetched'] = True
-    bse_df = st.session_state['bse_data']
+        fetch_errors = []
+        if today_only:
+            with st.spinner("Fetching..."), session_run(f"Announcements {d_from} to {d_to}"):
+                # Today's range goes through the shared refresh so every session sees the result
+                today_status = get_scheduler().refresh("announcements_today")
+            if today_status['error']: fetch_errors.append(today_status['error'])
+            elif today_status['value'] is not None: fetch_errors.extend(today_status['value'][1])
+            st.session_state['bse_key'] = ("today", today_status['refreshed_at'])
+        else:
+            key = ("announcements", d_from, d_to)
+            st.session_state.pop('bse_partial', None)
+            # Sessions asking for the same range wait for the first fetch and then read it from the cache
+            with get_shared_cache().lock(key):
+                if get_shared_cache().get(key) is None:
+                    range_df = stream_announcements(d_from, d_to, fetch_errors)
+                    # An incomplete range is shown to this session but fetched again by the next
+                    if fetch_errors:
+                        st.session_state['bse_partial'] = range_df
+                        key = ("partial", d_from, d_to)
+                    else:
+                        get_shared_cache().put(key, (range_df, []), ANNOUNCEMENT_TTL)
+            st.session_state['bse_key'] = key
+        for e in fetch_errors: st.warning(f"Could not fetch {e}")
+    if today_only:
+        today_status = get_scheduler().status("announcements_today")
+        # Until another range or file is loaded, show the background copy of today
+        bse_key = st.session_state['bse_key']
+        showing_today = bse_key is None or bse_key[0] == "today"
+        if showing_today and today_status['value'] is not None:
+            st.session_state['bse_key'] = ("today", today_status['refreshed_at'])
+        refreshed_caption(today_status)
+    # Output of collect_announcements.py, usually written by a scheduled run before market open
+    collected_path = announcements_utils.COLLECTED_PATH
+    if os.path.exists(collected_path):
+        collected_mtime = os.path.getmtime(collected_path)
+        collected_at = datetime.fromtimestamp(collected_mtime).strftime("%d %b %H:%M")
+        if st.button(f"Load Collected Announcements ({collected_at})"):
+            key = ("collected", collected_path, collected_mtime)
+            try:
+                # Each version of the file is parsed once for all sessions
+                get_shared_cache().get_or_load(key, lambda: announcements_utils.load_announcements(collected_path), ANNOUNCEMENT_TTL)
+                st.session_state['bse_key'] = key
+            except Exception as e:
+                st.error(f"Error loading {collected_path}: {e}")
+
+    bse_key = st.session_state['bse_key']
+    bse_df = None
+    if bse_key is None:
+        bse_df = pd.DataFrame()
+    elif bse_key[0] == "today":
+        today_status = get_scheduler().status("announcements_today")
+        if today_status['refreshed_at'] == bse_key[1]:
+            bse_df = today_status['value'][0]
+    elif bse_key[0] == "partial":
+        bse_df = st.session_state.get('bse_partial')
+    else:
+        cached = get_shared_cache().get(bse_key)
+        if cached:
+            # A fetched range is cached together with its (empty) error list
+            bse_df = cached[0][0] if bse_key[0] == "announcements" else cached[0]
+    if bse_df is None:
+        st.info("These announcements are no longer cached; fetch or load them again.")
+        bse_df = pd.DataFrame()
     if not bse_df.empty:
         st.success(f"Found {len(bse_df)} announcements.")
         types = ["All"] + sorted(bse_df['TYPE'].unique().tolist())
-        sel_type = st.selectbox("Filter Type", types)
-        disp_bse = bse_df if sel_type == "All" else bse_df[bse_df['TYPE'] == sel_type]
+        c1, c2 = st.columns(2)
+        with c1: sel_type = st.selectbox("Filter Type", types)
+        with c2: link_filters = st.multiselect("Only Announcements For", list(LINK_FILTERS), key="bse_link_filters")
+        bse_df = linked_announcements(st.session_state['bse_key'], bse_df)
+        mask = bse_df['TYPE'] == sel_type if sel_type != "All" else pd.Series(True, index=bse_df.index)
+        if link_filters:
+            # A row is kept when it matches any of the chosen links
+            linked = np.zeros(len(bse_df), dtype=bool)
+            for label in link_filters:
+                column = bse_df[LINK_FILTERS[label]]
+                linked |= column.notna().to_numpy() if column.dtype == "category" else column.to_numpy(dtype=bool)
+            mask &= linked
+        disp_bse = bse_df[mask]
+        if bse_df['NSE ID'].isna().all():
+            st.caption("No announcement could be matched to an NSE symbol yet; open a constituents tab or add "
+                       "a BSE scrip list at data/bse_scrips.csv.")
         dl_path = st.text_input("Local Download Folder Path")
         if st.button("Download PDFs"):
             if dl_path:
                 path = dl_path.strip().strip('"').strip("'")
                 if not os.path.exists(path): os.makedirs(path)
-                count, errs = announcements_utils.download_pdfs(disp_bse, path)
+                with session_run("Download PDFs"):
+                    count, errs = announcements_utils.download_pdfs(disp_bse, path, cache=get_attachment_cache())
                 if count > 0: st.success(f"Downloaded {count} files.")
                 for e in errs: st.error(e)
+                if filing_text.pdf_support():
+                    # Makes the downloaded filings searchable below; already extracted ones are skipped
+                    names = disp_bse['LINK'].astype(str).str.rsplit('/', n=1).str[-1].unique().tolist()
+                    extract_errors = []
+                    with st.spinner("Extracting filing text..."), session_run("Extract filing text"):
+                        extracted = filing_text.extract_filings(get_announcement_store(), get_attachment_cache(), names, errors=extract_errors)
+                    if extracted: st.caption(f"Extracted text from {extracted} filings.")
+                    for e in extract_errors: st.warning(f"Could not read {e}")
+                else:
+                    st.caption("Install pypdf to make the text of downloaded filings searchable.")
             else: st.error("Enter path.")
         st.dataframe(disp_bse, column_config={"LINK": st.column_config.LinkColumn("PDF", display_text="Open")}, use_container_width=True, hide_index=True, key="bse_table")
-    elif st.session_state.get('bse_fetched'): st.info("No announcements found.")
+    elif st.session_state['bse_key'] is not None: st.info("No announcements found.")
+
+with t_ann: run_fragment("Corp Announcements", render_announcements)
+
+def render_archive_search():
+    """Full-text search over every announcement saved in the local store."""
+    st.subheader("Search Stored Announcements")
+    st.caption('Words must all match; use "quoted words" for a phrase and capex* for a prefix.')
+    c1, c2, c3 = st.columns([2, 1, 1])
+    with c1: query = st.text_input("Search text", key="ann_search_text")
+    with c2: s_from = st.date_input("From", date.today() - timedelta(days=180), key="ann_search_from")
+    with c3: s_to = st.date_input("To", date.today(), key="ann_search_to")
+    groups = st.multiselect("Categories", list(announcements_utils.CATEGORY_GROUPS), key="ann_search_groups")
+    filing_count = get_announcement_store().filing_count()
+    in_filings = st.checkbox(f"Search filing text ({filing_count} downloaded filings)", key="ann_search_filings",
+                             disabled=not filing_count)
+    if not query:
+        return
+    categories = [announcements_utils.CATEGORY_GROUPS[g][0] for g in groups]
+    with metrics.stage('archive_search', query=query, filings=in_filings) as info:
+        results = get_announcement_store().search(query, s_from, s_to, categories, filings=in_filings)
+        info['rows'] = len(results)
+    if results.empty:
+        st.info("No stored announcements match.")
+        return
+    st.caption(f"{len(results)} matches (newest first, at most 500).")
+    if 'ATTACHMENTNAME' in results.columns:
+        results['LINK'] = announcements_utils.BSE_ATTACHMENT_URL + results['ATTACHMENTNAME'].astype(str)
+    cols = [c for c in ['day', 'SLONGNAME', 'NEWSSUB', 'HEADLINE', 'SUBCATNAME', 'category', 'LINK'] if c in results.columns]
+    st.dataframe(results[cols], column_config={"LINK": st.column_config.LinkColumn("PDF", display_text="Open")}, use_container_width=True, hide_index=True, key="ann_search_table")
+
+def render_live_feed():
+    """Shows today's new announcements; while watching, polls BSE every ANNOUNCEMENT_POLL_SECONDS."""
+    if 'ann_watcher' not in st.session_state:
+        st.session_state['ann_watcher'] = announcements_utils.AnnouncementWatcher()
+        st.session_state['live_announcements'] = pd.DataFrame()
+    watcher = st.session_state['ann_watcher']
+    if st.session_state.get('watch_announcements'):
+        poll_errors = []
+        with session_run("Announcement poll"):
+            new_rows = watcher.poll(errors=poll_errors)
+        if not new_rows.empty:
+            st.session_state['live_announcements'] = announcements_utils.compact_announcements(
+                pd.concat([new_rows, st.session_state['live_announcements']], ignore_index=True))
+        for e in poll_errors: st.warning(f"Could not fetch {e}")
+        st.caption(f"Last poll {watcher.last_polled:%H:%M:%S}: {len(new_rows)} new. Polling every {ANNOUNCEMENT_POLL_SECONDS}s.")
+    live_df = st.session_state['live_announcements']
+    if not live_df.empty:
+        st.dataframe(live_df, column_config={"LINK": st.column_config.LinkColumn("PDF", display_text="Open")}, use_container_width=True, hide_index=True, key="live_table")
+
+with t_ann:
+    st.subheader("Live Feed (Today)")
+    watching = st.toggle("Watch for new announcements", key="watch_announcements")
+    # Only this fragment reruns on each poll, not the whole dashboard
+    run_fragment("Live feed", render_live_feed, run_every=ANNOUNCEMENT_POLL_SECONDS if watching else None)
+    run_fragment("Archive search", render_archive_search)
 
 with t_scr:
     st.header("Imp Screeners")
@@ -384,3 +689,31 @@ with t_scr:
     for name, path in links:
         url = f"https://chartink.com/{'screener' if '-' in path else 'dashboard'}/{path}"
         st.markdown(f"- [{name}]({url})")
+
+# --- F&O List Freshness ---
+fno = market_scans.fno_status()
+if fno['fetched_at']:
+    st.sidebar.caption(f"F&O list: {fno['count']} symbols, updated {fno['age'] / 60:.0f} min ago"
+                       + (" (refreshing)" if fno['refreshing'] else ""))
+if fno['error']:
+    if fno['count']:
+        st.sidebar.warning(f"Could not refresh the NSE F&O list, using the last good copy: {fno['error']}")
+    else:
+        st.sidebar.error(f"Error fetching NSE F&O list: {fno['error']}")
+
+# --- Diagnostics ---
+# Reached only by full runs; a fragment rerun stops at the end of its fragment
+record_rerun("App", time.perf_counter() - run_started)
+with st.sidebar.expander("Diagnostics"):
+    rerun_times = st.session_state['rerun_times']
+    st.caption(f"Full rerun: {rerun_times['App'] * 1000:.0f} ms. Last run of each part: "
+               + ", ".join(f"{name} {wall * 1000:.0f} ms" for name, wall in rerun_times.items() if name != "App"))
+    last = st.session_state.get('last_run')
+    if last:
+        st.caption(f"Last run: {last['name']} took {last['wall']:.2f}s ({len(last['events'])} events)")
+        st.dataframe(metrics.stage_summary(last['events']), hide_index=True, use_container_width=True)
+    else:
+        st.caption("No fetch has run yet.")
+    cache_stats = get_shared_cache().stats()
+    st.caption(f"Shared cache: {cache_stats['entries']} entries, {cache_stats['bytes'] / 2**20:.1f} MB, "
+               f"{cache_stats['hits']} hits / {cache_stats['misses']} misses")
@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import market_scans
+
+INDEX_PATH = os.path.join("data", "symbol_index.json")
+# Optional BSE "List of Scrips" export (Security Code, Security Id, Security Name);
+# for listed equities the BSE Security Id is the NSE symbol
+SCRIP_MASTER_PATH = os.path.join("data", "bse_scrips.csv")
+# Exchange prefix of the IDs used by the market-scan tables
+ID_PREFIX = "NSE:"
+# Words dropped when matching company names across exchanges
+NAME_SUFFIXES = r"\b(?:the|limited|ltd|co|company|corporation|corp|inc)\b"
+
+def normalize_names(names):
+    """Vectorised company-name key: lowercase, '&' as 'and', common suffixes and punctuation removed."""
+    return (names.astype("string").fillna("").str.lower()
+            .str.replace("&", " and ", regex=False)
+            .str.replace(NAME_SUFFIXES, " ", regex=True)
+            .str.replace(r"[^a-z0-9]", "", regex=True))
+
+def scrip_codes(codes):
+    """BSE scrip codes as strings, whether they were read as ints, floats or text."""
+    return codes.astype("string").fillna("").str.replace(r"\.0$", "", regex=True)
+
+class SymbolIndex:
+    """Maps BSE announcements to the NSE-style IDs ('NSE:SYMBOL') of the market-scan tables.
+
+    Scrip codes are mapped through the BSE scrip master when
+    SCRIP_MASTER_PATH exists, and normalized company names through every
+    constituent table seen; a code match wins over a name match. The
+    learned names are saved to `path`, so the index keeps growing across
+    restarts.
+    """
+
+    def __init__(self, path=INDEX_PATH, scrip_master_path=SCRIP_MASTER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.by_code = {}
+        self.by_name = {}
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+            self.by_code.update(saved.get('by_code', {}))
+            self.by_name.update(saved.get('by_name', {}))
+        except (OSError, ValueError, AttributeError):
+            pass
+        if scrip_master_path and os.path.exists(scrip_master_path):
+            self.add_scrip_master(pd.read_csv(scrip_master_path, dtype=str, keep_default_na=False))
+
+    def add_scrip_master(self, df):
+        """Learns codes and names from a BSE scrip master frame. Returns the number of codes added."""
+        columns = {c.strip().lower(): c for c in df.columns}
+        code_col, id_col, name_col = (columns.get(c) for c in ("security code", "security id", "security name"))
+        if not code_col or not id_col:
+            return 0
+        ids = ID_PREFIX + df[id_col].astype("string").str.strip()
+        codes = dict(zip(scrip_codes(df[code_col]), ids))
+        with self._lock:
+            self.by_code.update(codes)
+            if name_col:
+                self.by_name.update(zip(normalize_names(df[name_col]), ids))
+            self.by_name.pop("", None)
+        return len(codes)
+
+    def add_constituents(self, df):
+        """Learns names from a constituents table and saves the index if it grew. Returns the names added."""
+        id_col = market_scans.id_column(df)
+        if not id_col or "name" not in df.columns or df.empty:
+            return 0
+        names = dict(zip(normalize_names(df["name"]), df[id_col].astype("string")))
+        names.pop("", None)
+        with self._lock:
+            added = {k: v for k, v in names.items() if self.by_name.get(k) != v}
+            self.by_name.update(added)
+        if added:
+            self.save()
+        return len(added)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with self._lock:
+            snapshot = {'by_code': dict(self.by_code), 'by_name': dict(self.by_name)}
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(self.path + '.tmp', self.path)
+
+    def lookup(self, df):
+        """Returns the NSE ID of every announcement row (SCRIP_CD, else SLONGNAME), <NA> where unknown."""
+        ids = pd.Series(pd.NA, index=df.index, dtype="string")
+        with self._lock:
+            if "SCRIP_CD" in df.columns and self.by_code:
+                ids = _map_distinct(df["SCRIP_CD"], scrip_codes, self.by_code)
+            if "SLONGNAME" in df.columns and self.by_name:
+                missing = ids.isna()
+                if missing.any():
+                    ids[missing] = _map_distinct(df.loc[missing, "SLONGNAME"], normalize_names, self.by_name)
+        return ids
+
+def _map_distinct(values, key, mapping):
+    # Keys are computed once per distinct value (a few thousand companies), not per row
+    codes, distinct = pd.factorize(values)
+    return _take(key(pd.Series(distinct, dtype="string")).map(mapping), codes, values.index).astype("string")
+
+def _take(distinct, codes, index):
+    # Expands per-distinct values back to rows as a categorical; code -1 (missing) becomes NaN
+    value_codes, values = pd.factorize(distinct)
+    return pd.Series(pd.Categorical.from_codes(np.append(value_codes, -1)[codes], values), index=index)
+
+def link_announcements(df, index, constituents=None, interested=(), fno_symbols=()):
+    """Adds 'NSE ID', 'Constituent Of', 'Interested' and 'F&O' columns to classified announcements.
+
+    `constituents` maps the IDs of the selected constituents to their
+    sector or index name. Rows are factorized by ID and every set is a
+    hash lookup on the distinct IDs, so the whole frame is linked in one
+    vectorised pass; the two ID columns are categoricals like the rest of
+    the frame. Returns a new frame.
+    """
+    df = df.copy()
+    ids = index.lookup(df)
+    codes, distinct = pd.factorize(ids)
+    distinct = pd.Series(distinct, dtype="string")
+    df["NSE ID"] = _take(distinct, codes, df.index)
+    df["Constituent Of"] = _take(distinct.map(constituents or {}), codes, df.index)
+    # The trailing False is the flag of rows with no ID (code -1)
+    df["Interested"] = np.append(distinct.isin(set(interested)).to_numpy(dtype=bool), False)[codes]
+    df["F&O"] = np.append(market_scans.fno_mask(distinct, fno_symbols), False)[codes]
+    return df
+
+def constituent_sources(frames):
+    """Maps each ID in constituent tables to the 'Source Name' it was listed under (first wins)."""
+    sources = {}
+    for df in frames:
+        id_col = market_scans.id_column(df)
+        if id_col and "Source Name" in df.columns and not df.empty:
+            for key, source in zip(df[id_col].astype(str), df["Source Name"].astype(str)):
+                sources.setdefault(key, source)
+    return sources
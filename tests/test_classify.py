@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from announcements_utils import CATEGORY_GROUPS, classify_data, search_data
+
+def announcements(**columns):
+    n = len(next(iter(columns.values())))
+    base = {
+        'SCRIP_CD': [500000 + i for i in range(n)],
+        'SLONGNAME': [f"Company {i} Ltd" for i in range(n)],
+        'ATTACHMENTNAME': [f"file{i}.pdf" for i in range(n)],
+        'DissemDT': [f"2026-10-{i % 28 + 1:02d}T10:00:00" for i in range(n)],
+    }
+    base.update(columns)
+    return pd.DataFrame(base)
+
+def per_keyword(keywords, df):
+    """The output of the search_data loop that classify_data replaces."""
+    parts = [search_data(k, df.copy()) for k in keywords]
+    parts = [p for p in parts if not p.empty]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+def assert_same(keywords, df):
+    assert_frame_equal(classify_data(keywords, df.copy()), per_keyword(keywords, df))
+
+def test_mixed_case():
+    df = announcements(
+        NEWSSUB=["CAPEX plan approved", "credit RATING reaffirmed", "Board meeting"],
+        HEADLINE=["", "Credit Rating", "investor meet on Friday"],
+        MORE=["", "", ""],
+        SUBCATNAME=["General", "Credit Rating", "Investor Meet"],
+    )
+    assert_same(["Capex", "Credit Rating", "Investor Meet"], df)
+
+def test_missing_values():
+    df = announcements(
+        NEWSSUB=["Capex update", None, np.nan, "Allotment of shares"],
+        HEADLINE=[None, "Press Release", None, np.nan],
+        MORE=[np.nan, None, "capex of Rs 50 cr", None],
+        SUBCATNAME=["General", None, np.nan, "Allotment"],
+    )
+    assert_same(["Capex", "Press Release", "Allotment", "None", "nan"], df)
+
+def test_missing_columns():
+    df = announcements(
+        NEWSSUB=["Expansion of plant", "Acquisition completed"],
+        HEADLINE=["", "acquisition"],
+    )
+    assert_same(["Expansion", "Acquisition"], df)
+
+def test_overlapping_and_prefix_keywords():
+    df = announcements(
+        NEWSSUB=["Alteration of Object clause", "Change in Objects clause", "Buy back and Buyback offer",
+                 "Rights issue of Right Issue", "Resolution plan"],
+        HEADLINE=["", "", "", "", "Resolution"],
+        MORE=["", "", "", "", ""],
+        SUBCATNAME=["", "", "", "", ""],
+    )
+    assert_same(["Object clause", "Objects clause", "Buyback", "Buy back", "Offer", "Rights", "Right Issue",
+                 "Resolution plan", "Resolution"], df)
+
+def test_non_ascii_text():
+    df = announcements(
+        NEWSSUB=["Café EXPANSION – phase II", "Straße capex", "ÉXPANSION", "Kelvin K sign", "İnvestor Meet"],
+        HEADLINE=["naïve capacity", "", "", "", ""],
+        MORE=["", "", "", "", ""],
+        SUBCATNAME=["", "", "", "", ""],
+    )
+    assert_same(["Expansion", "Capex", "Capacity", "K sign", "Investor Meet"], df)
+
+def test_duplicate_rows_within_a_keyword():
+    df = announcements(
+        NEWSSUB=["Capex", "Capex"],
+        HEADLINE=["", ""],
+        MORE=["", ""],
+        SUBCATNAME=["", ""],
+    ).assign(SCRIP_CD=1, SLONGNAME="Same Ltd", ATTACHMENTNAME="same.pdf", DissemDT="2026-10-01T10:00:00")
+    assert_same(["Capex", "Expansion"], df)
+
+def test_no_matches():
+    df = announcements(NEWSSUB=["Board meeting"], HEADLINE=[""], MORE=[""], SUBCATNAME=[""])
+    assert classify_data(["Capex"], df.copy()).empty
+    assert per_keyword(["Capex"], df).empty
+
+@pytest.mark.parametrize("group", list(CATEGORY_GROUPS))
+def test_category_keywords(group):
+    keywords = CATEGORY_GROUPS[group][2]
+    rng = np.random.default_rng(len(group))
+    words = keywords + [k.upper() for k in keywords] + ["board", "meeting", "outcome", None]
+    texts = [" ".join(str(w) for w in rng.choice(np.array(words, dtype=object), 3)) for _ in range(300)]
+    df = announcements(NEWSSUB=texts, HEADLINE=texts[::-1], MORE=[""] * 300, SUBCATNAME=["General"] * 300)
+    assert_same(keywords, df)
+
+def test_filing_text(tmp_path):
+    from datetime import date
+    from announcement_store import AnnouncementStore
+    from announcements_utils import classify_filings
+    store = AnnouncementStore(str(tmp_path / "announcements.db"))
+    df = announcements(
+        NEWSSUB=["Intimation", "Intimation", "Capex update"],
+        HEADLINE=["", "", ""],
+        MORE=["", "", ""],
+        SUBCATNAME=["General", "General", "General"],
+    ).assign(DissemDT="2026-10-01T10:00:00")
+    datastr, subcategory, _ = CATEGORY_GROUPS["company_update"]
+    store.save(datastr, subcategory, date(2026, 10, 1), date(2026, 10, 1), df)
+    store.save_filing("file0.pdf", "0", "The board approved a CAPEX of Rs 50 cr")
+    store.save_filing("file1.pdf", "1", "", error="encrypted")
+    store.save_filing("file2.pdf", "2", "Order win")
+    result = classify_filings(store, date(2026, 10, 1), date(2026, 10, 1), groups=["company_update"])
+    assert result[['TYPE', 'SCRIP_CD']].astype(str).values.tolist() == [["Capex", "500000"], ["Capex", "500002"]]
+    assert result['LINK'].astype(str).str.endswith(("file0.pdf", "file2.pdf")).all()
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.fake_server import synthetic_scan_rows
+from market_scans import SCORE_HISTORY, clean_scores, clean_scores_column
+
+class ScoreList(list):
+    pass
+
+def assert_matches_apply(rows):
+    scores = pd.Series(rows, index=range(10, 10 + len(rows)), dtype=object)
+    column = clean_scores_column(scores)
+    expected = scores.apply(clean_scores)
+    assert column.index.equals(expected.index)
+    # assert_equal treats NaN scores in the nested lists as equal
+    np.testing.assert_equal(column.tolist(), expected.tolist())
+
+def test_synthetic_tables():
+    assert_matches_apply([row['historicScores'] for row in synthetic_scan_rows(300, seed=3)])
+
+def test_history_lengths():
+    history = [[f"2026-01-{d % 28 + 1:02d}", d * 1.5] for d in range(SCORE_HISTORY * 2)]
+    assert_matches_apply([history[:n] for n in (0, 1, SCORE_HISTORY - 1, SCORE_HISTORY, SCORE_HISTORY + 1, len(history))])
+
+def test_rows_that_are_not_lists():
+    assert_matches_apply([None, np.nan, "[[1, 2]]", {"a": 1}, (["d", 1.0],), 5, [["d", 1.0]]])
+
+@pytest.mark.parametrize("entry", [
+    ["d", "12.5"], ["d", None], ["d", "x"], ["d"], [], ["d", np.nan], ["d", True], ["d", 7, "extra"],
+    4, 2.5, True, "a5", ("d", 1.0), {1: 2.0}, None, ScoreList(["d", 3.0]), ["d", [1]],
+])
+def test_odd_entries(entry):
+    good = [["d", 1.0], ["d", 2.0]]
+    assert_matches_apply([good + [entry], [entry] + good, [entry], good])
+
+def test_odd_entry_outside_the_kept_history():
+    history = [["d", "x"], "a5"] + [["d", float(d)] for d in range(SCORE_HISTORY)]
+    assert_matches_apply([history])
+
+def test_empty_column():
+    assert clean_scores_column(pd.Series([], dtype=object)).empty
@@ -0,0 +1,39 @@
+from datetime import date
+
+import pandas as pd
+
+import announcements_utils
+from announcement_store import AnnouncementStore
+
+DATASTR, SUBCATEGORY, _ = announcements_utils.CATEGORY_GROUPS["company_update"]
+
+def rows(*ids, day):
+    return pd.DataFrame([
+        {'NEWSID': i, 'SCRIP_CD': 500000, 'NEWSSUB': f"Update {i}", 'ATTACHMENTNAME': f"{i}.pdf",
+         'DissemDT': f"{day.isoformat()}T10:00:00"}
+        for i in ids
+    ])
+
+def test_failed_refetch_keeps_stored_rows(tmp_path, monkeypatch):
+    store = AnnouncementStore(str(tmp_path / "announcements.db"))
+    today = date.today()
+    store.save(DATASTR, SUBCATEGORY, today, today, rows("a", "b", day=today))
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError("503 Service Unavailable")
+    monkeypatch.setattr(announcements_utils, "fetch_page_json", unavailable)
+    errors = []
+    df = announcements_utils.fetch_category_cached(store, DATASTR, today, today, SUBCATEGORY, errors=errors)
+    assert errors
+    assert df['NEWSID'].tolist() == ["a", "b"]
+
+def test_partial_save_only_adds_new_rows(tmp_path):
+    store = AnnouncementStore(str(tmp_path / "announcements.db"))
+    day = date(2026, 10, 1)
+    store.save(DATASTR, SUBCATEGORY, day, day, rows("a", "b", day=day), complete=False)
+    store.save(DATASTR, SUBCATEGORY, day, day, rows("b", "c", day=day), complete=False)
+    assert store.load(DATASTR, SUBCATEGORY, day, day)['NEWSID'].tolist() == ["a", "b", "c"]
+    assert store.missing_days(DATASTR, SUBCATEGORY, day, day, today=date(2026, 10, 2)) == [day]
+    # A complete fetch replaces the range
+    store.save(DATASTR, SUBCATEGORY, day, day, rows("c", day=day), today=date(2026, 10, 2))
+    assert store.load(DATASTR, SUBCATEGORY, day, day)['NEWSID'].tolist() == ["c"]